@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def install_search_index(sender, **kwargs):
+    from .search import install
+
+    install()
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # полнотекстовый индекс вопросов не описывается моделью (api/search.py)
+        post_migrate.connect(install_search_index, sender=self)
@@ -0,0 +1,114 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from .flusher import PeriodicFlusher, bulk_write, requeue
+from .models import AnswerAttempt, CustomUser, GameSession, Question
+
+logger = logging.getLogger(__name__)
+
+
+class AttemptBuffer:
+    """
+    Буфер журнала ответов. Записи только добавляются, поэтому их можно
+    копить в памяти процесса и писать одним bulk_create: ответ игрока
+    не ждёт отдельного INSERT.
+
+    Буфер у каждого процесса свой: flush() из другого процесса (команды
+    калибровки, пересчёта) его не видит. Поэтому фоновый поток пишет буфер
+    раз в flush_interval секунд, а калибровка не трогает сессии, завершённые
+    позже get_settle_delay() секунд назад. При аварийном завершении воркера
+    теряются ответы за последние flush_interval секунд.
+
+    Ответы на удалённые сессии, вопросы или от удалённых пользователей
+    при записи отбрасываются; если база недоступна, буфер держит не больше
+    max_rows строк.
+    """
+    references = {'session_id': GameSession, 'user_id': CustomUser, 'question_id': Question}
+
+    def __init__(self, batch_size, flush_interval, max_rows=10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.lock = threading.Lock()
+        self.rows = []
+        self.last_flush = time.monotonic()
+
+    def add(self, attempt):
+        now = time.monotonic()
+        with self.lock:
+            self.rows.append(attempt)
+            due = len(self.rows) >= self.batch_size or now - self.last_flush >= self.flush_interval
+            rows = self._take(now) if due else []
+        self._write(rows)
+
+    def flush(self):
+        with self.lock:
+            rows = self._take(time.monotonic())
+        self._write(rows)
+
+    def _take(self, now):
+        rows, self.rows = self.rows, []
+        self.last_flush = now
+        return rows
+
+    def _write(self, rows):
+        if not rows:
+            return
+        try:
+            bulk_write(AnswerAttempt, rows, self.batch_size, self.references)
+        except Exception:
+            # строки возвращаются в буфер, следующий сброс попробует снова
+            with self.lock:
+                self.rows = requeue(self.rows, rows, self.max_rows, 'attempt log')
+            raise
+
+
+buffer = AttemptBuffer(
+    batch_size=getattr(settings, 'ATTEMPT_LOG_BATCH_SIZE', 200),
+    flush_interval=getattr(settings, 'ATTEMPT_LOG_FLUSH_INTERVAL', 5),
+    max_rows=getattr(settings, 'ATTEMPT_LOG_MAX_BUFFER', 10000),
+)
+flusher = PeriodicFlusher('attempt-log-flush', buffer.flush_interval, buffer.flush)
+
+
+def get_flush_interval():
+    return buffer.flush_interval
+
+
+def get_settle_delay():
+    """Через сколько секунд после завершения сессии её ответы гарантированно записаны"""
+    return buffer.flush_interval + getattr(settings, 'ATTEMPT_LOG_SETTLE_MARGIN', 5)
+
+
+def log_attempt(**fields):
+    """
+    Добавляет ответ в журнал. Внутри транзакции запись попадает в буфер
+    только после коммита, чтобы откатившийся ответ не остался в журнале.
+    """
+    attempt = AnswerAttempt(**fields)
+    transaction.on_commit(lambda: add(attempt), robust=True)
+    return attempt
+
+
+def add(attempt):
+    """Ответ игрока уже сохранён, поэтому ошибка записи журнала не должна дойти до запроса"""
+    flusher.ensure_started()
+    try:
+        buffer.add(attempt)
+    except Exception:
+        logger.exception('attempt log: flush failed, rows kept in buffer')
+
+
+def flush():
+    try:
+        buffer.flush()
+    except Exception:
+        logger.exception('attempt log: flush failed, rows kept in buffer')
+
+
+atexit.register(flush)
@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import attempt_log, pack_generator, pack_pool
+from .models import AnswerAttempt, GameSession, Question
+
+MIN_DIFFICULTY, MAX_DIFFICULTY = 1.0, 5.0
+# доля правильных ответов, соответствующая сложности 1 и 5
+EASIEST_RATE, HARDEST_RATE = 0.9, 0.1
+
+
+def rate_to_difficulty(rate):
+    difficulty = MIN_DIFFICULTY + (MAX_DIFFICULTY - MIN_DIFFICULTY) * (EASIEST_RATE - rate) / (EASIEST_RATE - HARDEST_RATE)
+    return min(MAX_DIFFICULTY, max(MIN_DIFFICULTY, difficulty))
+
+
+def difficulty_to_rate(difficulty):
+    return EASIEST_RATE - (EASIEST_RATE - HARDEST_RATE) * (difficulty - MIN_DIFFICULTY) / (MAX_DIFFICULTY - MIN_DIFFICULTY)
+
+
+def calibrated_difficulty(difficulty, attempts, correct, prior_weight):
+    """
+    Сглаженная сложность: авторская оценка работает как prior_weight
+    «виртуальных» ответов, поэтому вопросы с малым числом ответов
+    почти не отходят от неё.
+    """
+    rate = (correct + prior_weight * difficulty_to_rate(difficulty)) / (attempts + prior_weight)
+    return round(rate_to_difficulty(rate), 2)
+
+
+def calibrate(batch_size=1000, prior_weight=10):
+    """
+    Учитывает ответы из завершённых сессий, ещё не попавших в калибровку.
+    Каждая пачка сессий обрабатывается в своей транзакции и помечается
+    calibrated=True, поэтому повторный запуск не считает ответы дважды.
+    Недавно завершённые сессии пропускаются: их ответы могут ещё лежать
+    в буфере журнала другого процесса (см. attempt_log.get_settle_delay).
+    Возвращает (число сессий, число обновлённых вопросов).
+    """
+    attempt_log.flush()
+    sessions_done = questions_done = 0
+    settled = timezone.now() - timedelta(seconds=attempt_log.get_settle_delay())
+    while True:
+        with transaction.atomic():
+            session_ids = list(
+                GameSession.objects.select_for_update(skip_locked=True)
+                .filter(is_completed=True, calibrated=False)
+                .filter(Q(completed_at__isnull=True) | Q(completed_at__lt=settled))
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not session_ids:
+                break
+
+            totals = {
+                row['question_id']: row
+                for row in AnswerAttempt.objects.filter(session_id__in=session_ids)
+                .values('question_id')
+                .annotate(attempts=Count('id'), correct=Count('id', filter=Q(is_correct=True)))
+            }
+            questions = list(
+                Question.objects.select_for_update()
+                .filter(id__in=totals)
+                .only('id', 'difficulty', 'attempts_count', 'correct_count')
+            )
+            for question in questions:
+                question.attempts_count += totals[question.id]['attempts']
+                question.correct_count += totals[question.id]['correct']
+                question.calibrated_difficulty = calibrated_difficulty(
+                    question.difficulty, question.attempts_count, question.correct_count, prior_weight
+                )
+            Question.objects.bulk_update(
+                questions, ['attempts_count', 'correct_count', 'calibrated_difficulty'], batch_size=1000
+            )
+            GameSession.objects.filter(id__in=session_ids).update(calibrated=True)
+
+        sessions_done += len(session_ids)
+        questions_done += len(questions)
+    if questions_done:
+        pack_pool.invalidate()
+        pack_generator.invalidate_pools()
+    return sessions_done, questions_done
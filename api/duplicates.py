@@ -0,0 +1,225 @@
+import hashlib
+import re
+import zlib
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Question, QuestionLshBucket, QuestionSignature
+
+# Поиск почти одинаковых вопросов: MinHash-подпись по символьным шинглам
+# нормализованного текста и LSH-корзины по полосам подписи. Вопросы,
+# совпавшие хотя бы в одной полосе, — кандидаты; похожесть кандидатов
+# оценивается по доле совпавших значений подписи (оценка Жаккара).
+# Для 16 полос по 4 значения порог срабатывания корзин около 0.5.
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE = 5
+PRIME = (1 << 32) + 15  # простое больше 2^32
+WORD = re.compile(r'\w+')
+
+_random = np.random.RandomState(20240601)
+PERM_A = _random.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+PERM_B = _random.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+
+def get_threshold():
+    return getattr(settings, 'DUPLICATE_THRESHOLD', 0.8)
+
+
+def normalize_text(text):
+    return ' '.join(WORD.findall((text or '').lower().replace('ё', 'е')))
+
+
+def shingles(text):
+    text = normalize_text(text)
+    if len(text) <= SHINGLE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE] for i in range(len(text) - SHINGLE + 1)}
+
+
+def signature(text):
+    """MinHash-подпись: NUM_PERM значений uint32; None для пустого текста"""
+    items = shingles(text)
+    if not items:
+        return None
+    hashes = np.fromiter(
+        (zlib.crc32(item.encode('utf-8')) for item in items), dtype=np.uint64, count=len(items)
+    )
+    # (a * x + b) mod p для всех перестановок сразу: a, x < 2^32, поэтому без переполнения
+    values = (np.outer(PERM_A, hashes) + PERM_B[:, None]) % PRIME
+    return (values.min(axis=1) & 0xFFFFFFFF).astype(np.uint32)
+
+
+def band_keys(sig):
+    """Ключ LSH-корзины для каждой полосы: номер полосы и её значения в одном int64"""
+    keys = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(
+            sig[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8, person=band.to_bytes(2, 'little')
+        ).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+def similarity(first, second):
+    return float(np.count_nonzero(first == second)) / NUM_PERM
+
+
+def load_signature(data):
+    return np.frombuffer(data, dtype=np.uint32)
+
+
+def index_rows(question_id, sig):
+    """Строки подписи и корзин вопроса (для bulk_create)"""
+    return (
+        QuestionSignature(question_id=question_id, signature=sig.tobytes()),
+        [QuestionLshBucket(key=key, question_id=question_id) for key in band_keys(sig)],
+    )
+
+
+def write_index(entries):
+    """
+    Массовая запись подписей и корзин: entries — [(question_id, sig, keys), ...].
+    Строк корзин в BANDS раз больше, чем вопросов, поэтому они пишутся
+    executemany без создания объектов моделей.
+    """
+    if not entries:
+        return
+    signatures = QuestionSignature._meta.db_table
+    buckets = QuestionLshBucket._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {signatures} (question_id, signature) VALUES (%s, %s)',
+            [(question_id, sig.tobytes()) for question_id, sig, _ in entries],
+        )
+        cursor.executemany(
+            f'INSERT INTO {buckets} ("key", question_id) VALUES (%s, %s)',
+            [(key, question_id) for question_id, _, keys in entries for key in keys],
+        )
+
+
+def index_question(question):
+    """Пересчитывает подпись и корзины вопроса; вызывается при сохранении текста"""
+    sig = signature(question.question_text)
+    with transaction.atomic():
+        QuestionLshBucket.objects.filter(question_id=question.pk).delete()
+        QuestionSignature.objects.filter(question_id=question.pk).delete()
+        if sig is None:
+            return None
+        row, buckets = index_rows(question.pk, sig)
+        row.save(force_insert=True)
+        QuestionLshBucket.objects.bulk_create(buckets)
+    return sig
+
+
+def find_similar(text, exclude_id=None, threshold=None, sig=None):
+    """
+    Похожие вопросы: [(question_id, similarity), ...] по убыванию похожести.
+    Кандидаты выбираются по индексу корзин, поэтому время не зависит
+    от размера базы.
+    """
+    threshold = get_threshold() if threshold is None else threshold
+    sig = signature(text) if sig is None else sig
+    if sig is None:
+        return []
+    candidates = set(
+        QuestionLshBucket.objects.filter(key__in=band_keys(sig)).values_list('question_id', flat=True)
+    )
+    candidates.discard(exclude_id)
+    if not candidates:
+        return []
+
+    found = []
+    for question_id, data in QuestionSignature.objects.filter(question_id__in=candidates).values_list(
+        'question_id', 'signature'
+    ):
+        score = similarity(sig, load_signature(data))
+        if score >= threshold:
+            found.append((question_id, score))
+    found.sort(key=lambda item: (-item[1], item[0]))
+    return found
+
+
+def index_missing(batch_size=2000):
+    """Строит подписи для вопросов, у которых их ещё нет; возвращает их число"""
+    indexed = 0
+    last_id = 0
+    while True:
+        rows = list(
+            Question.objects.filter(id__gt=last_id, signature__isnull=True)
+            .order_by('id')
+            .values_list('id', 'question_text')[:batch_size]
+        )
+        if not rows:
+            return indexed
+        last_id = rows[-1][0]
+        entries = []
+        for question_id, text in rows:
+            sig = signature(text)
+            if sig is not None:
+                entries.append((question_id, sig, band_keys(sig)))
+        with transaction.atomic():
+            write_index(entries)
+        indexed += len(entries)
+
+
+def cluster(threshold=None, max_bucket=200, chunk_size=5000):
+    """
+    Группы дубликатов по всей базе: пары из общих корзин проверяются по
+    подписям и объединяются (union-find). Возвращает списки id, от больших групп к малым.
+    """
+    threshold = get_threshold() if threshold is None else threshold
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    pairs = set()
+    current_key, members = None, []
+
+    def collect():
+        # в очень большой корзине сравниваем всех только с первым, чтобы не уйти в квадрат
+        if len(members) > max_bucket:
+            pairs.update((members[0], other) for other in members[1:])
+        else:
+            pairs.update(
+                (first, second) for i, first in enumerate(members) for second in members[i + 1:]
+            )
+
+    rows = QuestionLshBucket.objects.order_by('key', 'question_id').values_list('key', 'question_id')
+    for key, question_id in rows.iterator(chunk_size=chunk_size):
+        if key != current_key:
+            if len(members) > 1:
+                collect()
+            current_key, members = key, []
+        members.append(question_id)
+    if len(members) > 1:
+        collect()
+
+    pairs = sorted(pairs)
+    for start in range(0, len(pairs), chunk_size):
+        chunk = pairs[start:start + chunk_size]
+        ids = {question_id for pair in chunk for question_id in pair}
+        signatures = {
+            question_id: load_signature(data)
+            for question_id, data in QuestionSignature.objects.filter(question_id__in=ids).values_list(
+                'question_id', 'signature'
+            )
+        }
+        for first, second in chunk:
+            if first in signatures and second in signatures and similarity(signatures[first], signatures[second]) >= threshold:
+                root_first, root_second = find(first), find(second)
+                if root_first != root_second:
+                    parent[max(root_first, root_second)] = min(root_first, root_second)
+
+    groups = {}
+    for question_id in parent:
+        groups.setdefault(find(question_id), []).append(question_id)
+    return sorted((sorted(group) for group in groups.values() if len(group) > 1), key=lambda group: (-len(group), group[0]))
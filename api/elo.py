@@ -0,0 +1,36 @@
+from django.conf import settings
+
+# Игрок и вопрос — соперники по Эло: правильный ответ — победа игрока.
+# Рейтинг вопроса задаётся его сложностью, поэтому изменения рейтинга
+# игрока зависят только от его собственных ответов.
+
+INITIAL_RATING = 1000
+RATING_FLOOR = 500  # минимум ело
+
+
+def get_k_factor():
+    return getattr(settings, 'ELO_K_FACTOR', 32)
+
+
+def get_question_base():
+    return getattr(settings, 'ELO_QUESTION_BASE', 1000)
+
+
+def get_difficulty_step():
+    return getattr(settings, 'ELO_DIFFICULTY_STEP', 150)
+
+
+def question_rating(difficulty):
+    """Рейтинг вопроса: сложность 3 («Стандарт») соответствует базовому рейтингу"""
+    return get_question_base() + (difficulty - 3) * get_difficulty_step()
+
+
+def expected_score(player_rating, opponent_rating):
+    return 1.0 / (1.0 + 10 ** ((opponent_rating - player_rating) / 400.0))
+
+
+def rating_change(player_rating, difficulty, is_correct):
+    """Изменение рейтинга игрока после ответа (с учётом нижней границы)"""
+    expected = expected_score(player_rating, question_rating(difficulty))
+    delta = round(get_k_factor() * ((1.0 if is_correct else 0.0) - expected))
+    return max(RATING_FLOOR, player_rating + delta) - player_rating
@@ -0,0 +1,59 @@
+import numpy as np
+
+from . import elo
+
+
+class EloReplay:
+    """
+    Векторный пересчёт рейтингов по истории ответов.
+
+    Рейтинг вопроса фиксирован (см. api/elo.py), поэтому игроки не зависят
+    друг от друга: внутри хронологической пачки ответы раскладываются на
+    раунды «k-й ответ каждого игрока», и каждый раунд считается одной
+    векторной операцией над всеми игроками сразу.
+    """
+
+    def __init__(self, players_count, k_factor=None, question_base=None, difficulty_step=None):
+        self.ratings = np.full(players_count, elo.INITIAL_RATING, dtype=np.int64)
+        self.k_factor = elo.get_k_factor() if k_factor is None else k_factor
+        self.question_base = elo.get_question_base() if question_base is None else question_base
+        self.difficulty_step = elo.get_difficulty_step() if difficulty_step is None else difficulty_step
+
+    def question_ratings(self, difficulty):
+        return self.question_base + (difficulty.astype(np.float64) - 3) * self.difficulty_step
+
+    def apply(self, players, difficulty, correct):
+        """
+        Применяет пачку ответов в хронологическом порядке.
+        players — индексы игроков, difficulty — сложности вопросов, correct — 0/1.
+        Возвращает рейтинг игрока после каждого ответа пачки.
+        """
+        n = len(players)
+        after = np.empty(n, dtype=np.int64)
+        if n == 0:
+            return after
+
+        opponents = self.question_ratings(difficulty)
+        scores = correct.astype(np.float64)
+
+        # номер ответа каждого игрока внутри пачки (0, 1, 2, ...) с сохранением хронологии
+        by_player = np.argsort(players, kind='stable')
+        sorted_players = players[by_player]
+        starts = np.flatnonzero(np.r_[True, sorted_players[1:] != sorted_players[:-1]])
+        lengths = np.diff(np.r_[starts, n])
+        occurrence = np.empty(n, dtype=np.int64)
+        occurrence[by_player] = np.arange(n) - np.repeat(starts, lengths)
+
+        by_round = np.argsort(occurrence, kind='stable')
+        bounds = np.r_[0, np.cumsum(np.bincount(occurrence))]
+
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            idx = by_round[lo:hi]
+            who = players[idx]
+            current = self.ratings[who]
+            expected = 1.0 / (1.0 + 10 ** ((opponents[idx] - current) / 400.0))
+            delta = np.rint(self.k_factor * (scores[idx] - expected)).astype(np.int64)
+            updated = np.maximum(elo.RATING_FLOOR, current + delta)
+            self.ratings[who] = updated
+            after[idx] = updated
+        return after
@@ -0,0 +1,102 @@
+import logging
+import threading
+
+from django.db import IntegrityError, close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicFlusher:
+    """
+    Фоновый поток процесса, раз в interval секунд вызывающий func.
+    Буферы в памяти (журнал ответов, история рейтинга) иначе сбрасываются
+    только при следующей записи, и простаивающий воркер держит строки до выхода.
+    Поток запускается лениво — при первой записи в буфер, то есть только
+    в тех процессах, которые действительно что-то копят.
+    """
+
+    def __init__(self, name, interval, func):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stopped = threading.Event()
+
+    def ensure_started(self):
+        if not self.interval or (self.thread is not None and self.thread.is_alive()):
+            return
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                close_old_connections()
+                self.func()
+            except Exception:
+                # строки остаются в буфере и будут записаны следующей попыткой
+                logger.exception('%s: periodic flush failed', self.name)
+                connection.close()
+
+
+def drop_orphans(rows, references):
+    """
+    Оставляет строки, все внешние ключи которых ещё существуют.
+    references: {'user_id': CustomUser, ...}. Пока строка ждала в буфере,
+    сессию, вопрос или пользователя могли удалить каскадом.
+    """
+    existing = {}
+    for attname, model in references.items():
+        ids = {getattr(row, attname) for row in rows} - {None}
+        existing[attname] = set(model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+    return [
+        row for row in rows
+        if all(getattr(row, attname) is None or getattr(row, attname) in existing[attname] for attname in references)
+    ]
+
+
+def bulk_write(model, rows, batch_size, references):
+    """
+    bulk_create буфера в своей транзакции. Если вставка нарушает внешний ключ,
+    строки с исчезнувшими ссылками отбрасываются и остальные пишутся повторно:
+    одна «осиротевшая» строка не должна навсегда блокировать буфер.
+    Остальные ошибки (база недоступна) пробрасываются — строки вернёт вызывающий.
+    """
+    try:
+        _insert(model, rows, batch_size)
+        return
+    except IntegrityError:
+        valid = drop_orphans(rows, references)
+        logger.warning('%s: dropped %d buffered rows with missing references', model.__name__, len(rows) - len(valid))
+    try:
+        _insert(model, valid, batch_size)
+    except IntegrityError:
+        logger.exception('%s: dropped %d buffered rows that cannot be written', model.__name__, len(valid))
+
+
+def _insert(model, rows, batch_size):
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create(rows, batch_size=batch_size)
+    except Exception:
+        # откатившаяся вставка могла уже проставить строкам id
+        for row in rows:
+            row.pk = None
+            row._state.adding = True
+        raise
+
+
+def requeue(buffered, rows, limit, name):
+    """Возвращает неудачно записанные строки в начало буфера, не больше limit строк"""
+    rows = rows + buffered
+    if len(rows) > limit:
+        logger.warning('%s: buffer over %d rows, dropping %d oldest', name, limit, len(rows) - limit)
+        rows = rows[len(rows) - limit:]
+    return rows
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, caches
+
+GAME_CACHE_ALIAS = 'game'
+
+# поля GameSession, из которых состоит кэшируемое состояние игры
+SESSION_FIELDS = (
+    'id', 'user_id', 'pack_id', 'question_ids', 'current_question_index',
+    'is_completed', 'correct_answers', 'question_shown_at', 'created_at', 'updated_at',
+)
+
+
+def get_game_cache():
+    try:
+        return caches[GAME_CACHE_ALIAS]
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def session_key(user_id, pack_id):
+    return f'game:session:{user_id}:{pack_id}'
+
+
+def cache_session(session):
+    """Write-through: сохраняет состояние активной сессии, завершённую убирает из кэша"""
+    if session.is_completed:
+        invalidate_session(session.user_id, session.pack_id)
+        return
+    session.get_question_ids()
+    state = {field: getattr(session, field) for field in SESSION_FIELDS}
+    get_game_cache().set(
+        session_key(session.user_id, session.pack_id),
+        state,
+        getattr(settings, 'GAME_SESSION_CACHE_TIMEOUT', 60 * 60),
+    )
+
+
+def invalidate_session(user_id, pack_id):
+    get_game_cache().delete(session_key(user_id, pack_id))
+
+
+def session_from_state(state):
+    from .models import GameSession
+
+    session = GameSession(**state)
+    session._state.adding = False
+    session._state.db = 'default'
+    return session
+
+
+def get_active_session(user, pack_id, question_id=None):
+    """
+    Read-through: активная сессия (user, pack) из кэша, при промахе — из базы.
+
+    Если передан question_id, а в кэше текущим записан другой вопрос,
+    состояние считается устаревшим (например, его изменил другой процесс)
+    и перечитывается из базы. Бросает GameSession.DoesNotExist.
+    """
+    from .models import GameSession
+
+    state = get_game_cache().get(session_key(user.pk, pack_id))
+    if state is not None:
+        session = session_from_state(state)
+        if question_id is None or session.get_current_question_id() == question_id:
+            return session
+
+    session = GameSession.objects.filter(
+        user=user,
+        pack_id=pack_id,
+        is_completed=False
+    ).latest('created_at')
+    cache_session(session)
+    return session
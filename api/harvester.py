@@ -0,0 +1,247 @@
+import hashlib
+import json
+import os
+import re
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from django.utils import timezone
+
+from .matching import split_accepted_answers
+
+# Сборщик вопросов с db.chgk.info: страницы скачиваются пулом потоков,
+# разбираются обычным HTMLParser (ответы есть в HTML, просто скрыты CSS),
+# вопросы дописываются в JSONL, а прогресс — в файл контрольной точки,
+# поэтому прерванный сбор продолжается с того же места. Результат
+# загружается командой import_questions (api/importer.py). Адрес картинки
+# пишется в image_url, а не в image: поле модели хранит имя файла в
+# MEDIA_ROOT, и импортёр image_url не читает.
+
+DEFAULT_URL = 'https://db.chgk.info/random'
+USER_AGENT = 'chgk-harvester/1.0'
+BLOCK_TAGS = {'p', 'div', 'br', 'li', 'blockquote', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+LABELS = {
+    'answer': re.compile(r'^Ответ\s*:\s*', re.IGNORECASE),
+    'accepted': re.compile(r'^За[чс][её]т\s*:\s*', re.IGNORECASE),
+    'note': re.compile(r'^Комментари[йи]\s*:\s*', re.IGNORECASE),
+    'other': re.compile(r'^(Источник|Автор|Незач[её]т|Ресурс)[^:]{0,12}:\s*', re.IGNORECASE),
+}
+QUESTION_LABEL = re.compile(r'^Вопрос\s*\d*\s*:\s*', re.IGNORECASE)
+
+
+class QuestionPageParser(HTMLParser):
+    """Собирает блоки div.random_question: текстовые строки и картинки каждого блока"""
+
+    def __init__(self, block_class='random_question'):
+        super().__init__(convert_charrefs=True)
+        self.block_class = block_class
+        self.blocks = []
+        self.depth = 0  # глубина div внутри текущего блока, 0 — вне блока
+        self.lines = []
+        self.images = []
+        self.current = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'div':
+            if self.depth:
+                self.depth += 1
+            elif self.block_class in (attrs.get('class') or '').split():
+                self.depth = 1
+                self.lines, self.images, self.current = [], [], []
+                return
+        if not self.depth:
+            return
+        if tag in BLOCK_TAGS:
+            self._break()
+        if tag == 'img' and attrs.get('src'):
+            self.images.append(attrs['src'])
+
+    def handle_endtag(self, tag):
+        if not self.depth:
+            return
+        if tag in BLOCK_TAGS:
+            self._break()
+        if tag == 'div':
+            self.depth -= 1
+            if not self.depth:
+                self.blocks.append((self.lines, self.images))
+
+    def handle_data(self, data):
+        if self.depth:
+            self.current.append(data)
+
+    def _break(self):
+        text = ' '.join(''.join(self.current).split())
+        if text:
+            self.lines.append(text)
+        self.current = []
+
+
+def parse_block(lines, images, base_url=''):
+    """Поля вопроса из строк блока; None, если нет текста вопроса или ответа"""
+    fields = {'question': [], 'answer': [], 'accepted': [], 'note': []}
+    section = 'question'
+    for line in lines:
+        for name, label in LABELS.items():
+            match = label.match(line)
+            if match:
+                section, line = name, line[match.end():]
+                break
+        if section == 'question':
+            line = QUESTION_LABEL.sub('', line)
+        if section in fields and line:
+            fields[section].append(line)
+
+    question_text = '\n'.join(fields['question']).strip()
+    answer_text = re.sub(r'\.$', '', ' '.join(fields['answer']).strip())
+    if not question_text or not answer_text:
+        return None
+    return {
+        'question_text': question_text,
+        'answer_text': answer_text,
+        'accepted_answers': split_accepted_answers(' '.join(fields['accepted'])) if fields['accepted'] else [],
+        'question_note': ' '.join(fields['note']).strip(),
+        'image_url': urljoin(base_url, images[0]) if images else None,
+    }
+
+
+def parse_questions(html, base_url=''):
+    parser = QuestionPageParser()
+    parser.feed(html)
+    parser.close()
+    questions = []
+    for lines, images in parser.blocks:
+        question = parse_block(lines, images, base_url)
+        if question:
+            questions.append(question)
+    return questions
+
+
+def fetch(url, timeout=15, retries=3, backoff=1.0):
+    request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+    for attempt in range(retries + 1):
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                charset = response.headers.get_content_charset() or 'utf-8'
+                return response.read().decode(charset, errors='replace')
+        except (urllib.error.URLError, TimeoutError, ConnectionError):
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+def question_hash(question):
+    text = ' '.join(question['question_text'].lower().split())
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=12).hexdigest()
+
+
+class Harvester:
+    """
+    Скачивает pages страниц не более чем workers потоками. Вопросы
+    дописываются в output (JSONL, по записи фикстуры в строке), в checkpoint —
+    число страниц, обработанных подряд с начала. При повторном запуске сбор
+    продолжается с первой необработанной страницы, а уже собранные вопросы
+    читаются из output, чтобы не записать их снова.
+
+    В url можно указать {page} для постраничных адресов; без него каждая
+    страница — новая случайная выборка.
+    """
+
+    def __init__(self, output, checkpoint=None, url=DEFAULT_URL, workers=4, delay=0.0, difficulty=3,
+                 fetcher=fetch, page_retries=2):
+        self.output = output
+        self.checkpoint = checkpoint or output + '.checkpoint'
+        self.url = url
+        self.workers = workers
+        self.delay = delay
+        self.difficulty = difficulty
+        self.fetcher = fetcher
+        self.page_retries = page_retries
+        self.pages_done = 0
+        self.completed = set()  # страницы, обработанные не по порядку
+        self.written = self.repeated = self.failed = 0
+        self.seen = set()
+
+    def load_state(self):
+        if os.path.exists(self.checkpoint):
+            with open(self.checkpoint, encoding='utf-8') as f:
+                self.pages_done = json.load(f).get('pages_done', 0)
+        if os.path.exists(self.output):
+            with open(self.output, encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        self.seen.add(question_hash(json.loads(line)['fields']))
+
+    def save_state(self):
+        temporary = self.checkpoint + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump({'pages_done': self.pages_done, 'questions': len(self.seen), 'url': self.url}, f)
+        os.replace(temporary, self.checkpoint)
+
+    def page_url(self, number):
+        return self.url.format(page=number + 1) if '{page}' in self.url else self.url
+
+    def fetch_page(self, number):
+        if self.delay:
+            time.sleep(self.delay)
+        url = self.page_url(number)
+        return parse_questions(self.fetcher(url), url)
+
+    def mark_done(self, number):
+        self.completed.add(number)
+        while self.pages_done in self.completed:
+            self.completed.remove(self.pages_done)
+            self.pages_done += 1
+
+    def run(self, pages, progress=None):
+        self.load_state()
+        started = time.perf_counter()
+        pub_date = timezone.now().isoformat()
+        numbers = iter(range(self.pages_done, pages))
+        failures = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool, open(self.output, 'a', encoding='utf-8') as out:
+            # в работе не больше 2 * workers страниц: память не растёт с числом страниц
+            pending = {}
+            for number in numbers:
+                pending[pool.submit(self.fetch_page, number)] = number
+                if len(pending) >= self.workers * 2:
+                    break
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    number = pending.pop(future)
+                    try:
+                        questions = future.result()
+                    except Exception:
+                        failures[number] = failures.get(number, 0) + 1
+                        if failures[number] <= self.page_retries:
+                            pending[pool.submit(self.fetch_page, number)] = number
+                            continue
+                        # страница не отмечается обработанной и будет скачана при следующем запуске
+                        self.failed += 1
+                        questions = None
+                    for question in questions or ():
+                        key = question_hash(question)
+                        if key in self.seen:
+                            self.repeated += 1
+                            continue
+                        self.seen.add(key)
+                        fields = dict(question, difficulty=self.difficulty, pub_date_q=pub_date)
+                        out.write(json.dumps({'model': 'api.question', 'fields': fields}, ensure_ascii=False) + '\n')
+                        self.written += 1
+                    out.flush()
+                    if questions is not None:
+                        self.mark_done(number)
+                    self.save_state()
+                    if progress:
+                        progress(self, time.perf_counter() - started)
+                    number = next(numbers, None)
+                    if number is not None:
+                        pending[pool.submit(self.fetch_page, number)] = number
+        return self.written
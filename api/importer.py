@@ -0,0 +1,298 @@
+import json
+
+from django.core.exceptions import SuspiciousOperation
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import duplicates
+from .matching import build_question_keys, split_accepted_answers
+from .models import CustomUser, Pack, Question, QuestionLshBucket, QuestionSignature
+
+# Потоковый импорт вопросов из фикстур Django (JSON-массив) и JSONL.
+# Файл читается по частям, записи проверяются и пишутся пачками через
+# bulk_create, поэтому память не зависит от размера файла. Question.save()
+# и сигналы не вызываются: ключи ответа, MinHash-подписи и состав пака
+# заполняются здесь же, полнотекстовый индекс обновляют триггеры базы.
+# image — имя уже лежащего в хранилище файла (как в фикстурах dumpdata);
+# имена, которых в хранилище нет, отбрасываются с предупреждением.
+
+DIFFICULTIES = {level for level, _ in Question.DIFFICULTY_CHOICES}
+SQL_PARAMS_CHUNK = 900
+
+
+class RecordError(ValueError):
+    """Запись не прошла проверку; импорт продолжается со следующей"""
+
+
+def iter_json_array(stream, chunk_size=1 << 16):
+    """Объекты JSON-массива верхнего уровня по одному, без чтения файла целиком"""
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+
+    def more():
+        nonlocal buffer, position, eof
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    def skip(chars):
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in chars:
+                position += 1
+            if position < len(buffer) or eof:
+                return
+            more()
+
+    skip(' \t\r\n')
+    if position >= len(buffer) or buffer[position] != '[':
+        raise ValueError('expected a JSON array')
+    position += 1
+    while True:
+        skip(' \t\r\n,')
+        if position >= len(buffer):
+            raise ValueError('unexpected end of file')
+        if buffer[position] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more()
+            continue
+        position = end
+        yield item
+
+
+def iter_jsonl(stream):
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f'line {number}: {e}')
+
+
+def iter_file(path):
+    """Записи файла; формат по первому символу: '[' — массив (фикстура), иначе JSONL"""
+    with open(path, encoding='utf-8-sig') as stream:
+        head = stream.read(4096).lstrip()
+    with open(path, encoding='utf-8-sig') as stream:
+        if head.startswith('['):
+            yield from iter_json_array(stream)
+        else:
+            yield from iter_jsonl(stream)
+
+
+def question_fields(record):
+    """Поля вопроса из записи фикстуры или плоской записи JSONL; None — запись не вопрос"""
+    if not isinstance(record, dict):
+        raise RecordError('record is not an object')
+    if 'model' in record:
+        if str(record['model']).lower() != 'api.question':
+            return None
+        return record.get('fields') or {}
+    return record
+
+
+def build_question(fields, default_author_id=None):
+    question_text = fields.get('question_text')
+    answer_text = fields.get('answer_text')
+    if not isinstance(question_text, str) or not question_text.strip():
+        raise RecordError('question_text is required')
+    if not isinstance(answer_text, str) or not answer_text.strip():
+        raise RecordError('answer_text is required')
+
+    difficulty = fields.get('difficulty', 1)
+    if isinstance(difficulty, bool) or not isinstance(difficulty, int) or difficulty not in DIFFICULTIES:
+        raise RecordError(f'invalid difficulty: {difficulty!r}')
+
+    accepted = fields.get('accepted_answers') or []
+    if isinstance(accepted, str):
+        accepted = split_accepted_answers(accepted)
+    if not isinstance(accepted, list) or not all(isinstance(item, str) for item in accepted):
+        raise RecordError('accepted_answers must be a list of strings')
+
+    pub_date = fields.get('pub_date_q')
+    if pub_date:
+        parsed = parse_datetime(str(pub_date))
+        if parsed is None:
+            raise RecordError(f'invalid pub_date_q: {pub_date!r}')
+        pub_date = timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+    else:
+        pub_date = timezone.now()
+
+    author_id = fields.get('author_q', default_author_id)
+    if author_id is not None and (isinstance(author_id, bool) or not isinstance(author_id, int)):
+        raise RecordError(f'invalid author_q: {author_id!r}')
+
+    image = fields.get('image') or None
+    if image is not None and not isinstance(image, str):
+        raise RecordError(f'invalid image: {image!r}')
+
+    note = fields.get('question_note')
+    return Question(
+        question_text=question_text,
+        answer_text=answer_text,
+        accepted_answers=accepted,
+        answer_key='\n'.join(build_question_keys(answer_text, accepted)),
+        question_note=note if isinstance(note, str) else None,
+        image=image,
+        author_q_id=author_id,
+        pub_date_q=pub_date,
+        difficulty=difficulty,
+    )
+
+
+class QuestionImporter:
+    def __init__(self, batch_size=1000, pack=None, default_author_id=None, dedupe=True, threshold=None, dry_run=False):
+        self.batch_size = batch_size
+        self.pack = pack
+        self.default_author_id = default_author_id
+        self.dedupe = dedupe
+        self.threshold = duplicates.get_threshold() if threshold is None else threshold
+        self.dry_run = dry_run
+        self.created = self.duplicates = self.skipped = 0
+        self.errors = []
+        self.warnings = []
+        self.batch = []
+        self.storage = Question._meta.get_field('image').storage
+
+    def feed(self, records, source=''):
+        for number, record in enumerate(records, 1):
+            try:
+                fields = question_fields(record)
+                if fields is None:
+                    self.skipped += 1
+                    continue
+                question = build_question(fields, self.default_author_id)
+            except RecordError as e:
+                self.errors.append(f'{source}#{number}: {e}')
+                continue
+            if question.image and not self._image_exists(question.image.name):
+                self.warnings.append(f'{source}#{number}: image {question.image.name!r} not found in storage, dropped')
+                question.image = None
+            self.batch.append(question)
+            if len(self.batch) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        batch, self.batch = self.batch, []
+        if not batch:
+            return
+        batch = self._check_authors(batch)
+        signatures = [duplicates.signature(question.question_text) for question in batch]
+        keys = [duplicates.band_keys(sig) if sig is not None else [] for sig in signatures]
+
+        pack_ids = []
+        if self.dedupe:
+            batch, signatures, keys, existing_ids = self._drop_duplicates(batch, signatures, keys)
+            pack_ids.extend(existing_ids)
+        if self.dry_run:
+            self.created += len(batch)
+            return
+
+        with transaction.atomic():
+            Question.objects.bulk_create(batch, batch_size=self.batch_size)
+            duplicates.write_index([
+                (question.pk, sig, question_keys)
+                for question, sig, question_keys in zip(batch, signatures, keys)
+                if sig is not None
+            ])
+
+            if self.pack is not None:
+                pack_ids.extend(question.pk for question in batch)
+                Through = Pack.questions.through
+                Through.objects.bulk_create(
+                    [Through(pack_id=self.pack.pk, question_id=question_id) for question_id in pack_ids],
+                    batch_size=5000,
+                    ignore_conflicts=True,
+                )
+        self.created += len(batch)
+
+    def _image_exists(self, name):
+        try:
+            return self.storage.exists(name)
+        except (SuspiciousOperation, ValueError):
+            # абсолютные адреса и пути за пределами MEDIA_ROOT
+            return False
+
+    def _check_authors(self, batch):
+        author_ids = {question.author_q_id for question in batch if question.author_q_id is not None}
+        known = set()
+        for chunk in _chunks(sorted(author_ids), SQL_PARAMS_CHUNK):
+            known.update(CustomUser.objects.filter(id__in=chunk).values_list('id', flat=True))
+        valid = []
+        for question in batch:
+            if question.author_q_id is not None and question.author_q_id not in known:
+                self.errors.append(f'unknown author_q {question.author_q_id}: {question.question_text[:40]!r}')
+            else:
+                valid.append(question)
+        return valid
+
+    def _drop_duplicates(self, batch, signatures, keys):
+        """
+        Убирает почти одинаковые вопросы: уже существующие в базе (по LSH-корзинам,
+        в том числе из предыдущих пачек) и повторы внутри пачки.
+        Возвращает оставшиеся вопросы, их подписи и ключи корзин, id найденных в базе дубликатов.
+        """
+        candidates = {}
+        all_keys = sorted({key for question_keys in keys for key in question_keys})
+        for chunk in _chunks(all_keys, SQL_PARAMS_CHUNK):
+            for key, question_id in QuestionLshBucket.objects.filter(key__in=chunk).values_list('key', 'question_id'):
+                candidates.setdefault(key, []).append(question_id)
+        stored = {}
+        candidate_ids = sorted({question_id for ids in candidates.values() for question_id in ids})
+        for chunk in _chunks(candidate_ids, SQL_PARAMS_CHUNK):
+            for question_id, data in QuestionSignature.objects.filter(question_id__in=chunk).values_list(
+                'question_id', 'signature'
+            ):
+                stored[question_id] = duplicates.load_signature(data)
+
+        kept, kept_signatures, kept_keys, existing_ids = [], [], [], []
+        local = {}  # ключ корзины -> подписи уже принятых вопросов пачки
+        for question, sig, question_keys in zip(batch, signatures, keys):
+            if sig is None:
+                kept.append(question)
+                kept_signatures.append(sig)
+                kept_keys.append(question_keys)
+                continue
+            match = self._best_match(sig, question_keys, candidates, stored)
+            if match is not None:
+                existing_ids.append(match)
+                self.duplicates += 1
+                continue
+            if any(
+                duplicates.similarity(sig, other) >= self.threshold
+                for key in question_keys for other in local.get(key, ())
+            ):
+                self.duplicates += 1
+                continue
+            for key in question_keys:
+                local.setdefault(key, []).append(sig)
+            kept.append(question)
+            kept_signatures.append(sig)
+            kept_keys.append(question_keys)
+        return kept, kept_signatures, kept_keys, existing_ids
+
+    def _best_match(self, sig, question_keys, candidates, stored):
+        best, best_score = None, None
+        for key in question_keys:
+            for question_id in candidates.get(key, ()):
+                other = stored.get(question_id)
+                if other is None:
+                    continue
+                score = duplicates.similarity(sig, other)
+                if score >= self.threshold and (best is None or (score, -question_id) > (best_score, -best)):
+                    best, best_score = question_id, score
+        return best
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
@@ -0,0 +1,97 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from .models import CustomUser, RatingBucket
+
+LEADERBOARD_FIELDS = ('id', 'username', 'elo_rating')
+
+
+def shift_bucket(rating, delta):
+    updated = RatingBucket.objects.filter(rating=rating).update(players=F('players') + delta)
+    if not updated:
+        try:
+            with transaction.atomic():
+                RatingBucket.objects.create(rating=rating, players=delta)
+        except IntegrityError:
+            RatingBucket.objects.filter(rating=rating).update(players=F('players') + delta)
+
+
+def move_player(old_rating, new_rating):
+    """Переносит игрока между корзинами гистограммы при изменении рейтинга"""
+    if old_rating == new_rating:
+        return
+    if old_rating is not None:
+        shift_bucket(old_rating, -1)
+    if new_rating is not None:
+        shift_bucket(new_rating, 1)
+
+
+def rebuild():
+    """Полный пересчёт гистограммы по таблице пользователей"""
+    counts = CustomUser.objects.values('elo_rating').annotate(players=Count('id'))
+    with transaction.atomic():
+        RatingBucket.objects.all().delete()
+        RatingBucket.objects.bulk_create(
+            RatingBucket(rating=row['elo_rating'], players=row['players']) for row in counts
+        )
+
+
+def players_above(rating):
+    return RatingBucket.objects.filter(rating__gt=rating).aggregate(
+        total=Sum('players')
+    )['total'] or 0
+
+
+def with_ranks(rows):
+    """
+    Проставляет места (равные рейтинги делят место) строкам,
+    отсортированным по (-elo_rating, id):
+    место первой строки берётся из гистограммы, остальные — по корзинам
+    между рейтингами окна, без подсчёта игроков в таблице пользователей.
+    """
+    if not rows:
+        return rows
+    highest, lowest = rows[0]['elo_rating'], rows[-1]['elo_rating']
+    above = players_above(highest)
+    buckets = dict(
+        RatingBucket.objects.filter(rating__gte=lowest, rating__lte=highest)
+        .values_list('rating', 'players')
+    )
+    ranks = {}
+    for rating in sorted(buckets, reverse=True):
+        ranks[rating] = above + 1
+        above += buckets[rating]
+    for row in rows:
+        row['position'] = ranks.get(row['elo_rating'])
+    return rows
+
+
+def top(limit):
+    rows = list(
+        CustomUser.objects.order_by('-elo_rating', 'id').values(*LEADERBOARD_FIELDS)[:limit]
+    )
+    return with_ranks(rows)
+
+
+def around(user, radius):
+    """Игрок и по radius соседей выше и ниже него в таблице"""
+    rating = CustomUser.objects.values_list('elo_rating', flat=True).get(pk=user.pk)
+    users = CustomUser.objects.values(*LEADERBOARD_FIELDS)
+
+    # Каждая сторона — два запроса-диапазона по индексу (-elo_rating, id):
+    # сначала тот же рейтинг с границей по id, затем строго больший/меньший.
+    # Условие с OR индекс не использует и читает всех игроков выше/ниже.
+    higher = list(
+        users.filter(elo_rating=rating, id__lt=user.pk).order_by('-id')[:radius]
+    )
+    if len(higher) < radius:
+        higher += users.filter(elo_rating__gt=rating).order_by('elo_rating', '-id')[:radius - len(higher)]
+    lower = list(
+        users.filter(elo_rating=rating, id__gt=user.pk).order_by('id')[:radius]
+    )
+    if len(lower) < radius:
+        lower += users.filter(elo_rating__lt=rating).order_by('-elo_rating', 'id')[:radius - len(lower)]
+
+    me = {'id': user.pk, 'username': user.username, 'elo_rating': rating}
+    rows = with_ranks(list(reversed(higher)) + [me] + lower)
+    return rows, me['position']
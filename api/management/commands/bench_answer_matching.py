@@ -0,0 +1,82 @@
+import json
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.matching import build_answer_keys, match_keys, normalize_answer
+
+DEFAULT_FIXTURES = ['questions.json', 'pack_1.json', 'pack_2.json', 'pack_3.json']
+
+
+def perturb(answer, rng):
+    """Типичные отклонения ответа игрока от авторского"""
+    variants = [
+        answer.upper(),
+        answer.replace('е', 'ё'),
+        f'«{answer}».',
+        ' '.join(reversed(answer.split())),
+    ]
+    letters = [i for i, char in enumerate(answer) if char.isalpha()]
+    if len(letters) > 6:
+        i = rng.choice(letters)
+        variants.append(answer[:i] + answer[i + 1:])
+    return variants
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк проверки ответов на вопросах из json-фикстур'
+
+    def add_arguments(self, parser):
+        parser.add_argument('fixtures', nargs='*', default=DEFAULT_FIXTURES)
+        parser.add_argument('--rounds', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        answers = []
+        for name in options['fixtures']:
+            with open(settings.BASE_DIR / name, encoding='utf-8-sig') as f:
+                answers += [
+                    item['fields']['answer_text'] for item in json.load(f)
+                    if item.get('model') == 'api.question'
+                ]
+        if not answers:
+            self.stdout.write('No answers found')
+            return
+
+        started = time.perf_counter()
+        keys = [build_answer_keys(answer) for answer in answers]
+        build_time = time.perf_counter() - started
+
+        cases = []
+        for answer, answer_keys in zip(answers, keys):
+            cases += [(variant, answer_keys, True) for variant in perturb(answer, rng)]
+        others = list(zip(answers, keys))
+        for answer, answer_keys in others:
+            wrong, _ = rng.choice(others)
+            if normalize_answer(wrong) not in answer_keys:
+                cases.append((wrong, answer_keys, False))
+
+        accepted = rejected = 0
+        started = time.perf_counter()
+        for _ in range(options['rounds']):
+            # ответы игроков уникальны, поэтому меряем без кэша нормализации
+            normalize_answer.cache_clear()
+            for submitted, answer_keys, expected in cases:
+                result = match_keys(submitted, answer_keys)
+                if result == expected:
+                    if expected:
+                        accepted += 1
+                    else:
+                        rejected += 1
+        elapsed = time.perf_counter() - started
+        checks = len(cases) * options['rounds']
+
+        positives = sum(1 for case in cases if case[2]) * options['rounds']
+        negatives = checks - positives
+        self.stdout.write(f'answers: {len(answers)}, cases: {len(cases)}, checks: {checks}')
+        self.stdout.write(f'key build: {build_time * 1e6 / len(answers):.1f} us/answer')
+        self.stdout.write(f'match: {elapsed * 1e6 / checks:.2f} us/check')
+        self.stdout.write(f'accepted variants: {accepted}/{positives}, rejected wrong: {rejected}/{negatives}')
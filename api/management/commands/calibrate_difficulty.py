@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.calibration import calibrate
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сложность вопросов по ответам из ещё не учтённых завершённых сессий'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='сессий в одной транзакции')
+        parser.add_argument('--prior-weight', type=float, default=10, help='вес авторской сложности в ответах')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        sessions, questions = calibrate(options['batch_size'], options['prior_weight'])
+        self.stdout.write(
+            f'Calibrated {questions} questions from {sessions} sessions '
+            f'in {time.perf_counter() - started:.2f}s'
+        )
@@ -0,0 +1,32 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import duplicates
+
+
+class Command(BaseCommand):
+    help = 'Строит недостающие MinHash-подписи и группирует почти одинаковые вопросы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=None)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--output', help='файл JSON со списком групп id')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        indexed = duplicates.index_missing(options['batch_size'])
+        self.stdout.write(f'Indexed {indexed} questions in {time.perf_counter() - started:.2f}s')
+
+        groups = duplicates.cluster(options['threshold'])
+        self.stdout.write(
+            f'Found {len(groups)} duplicate groups covering {sum(len(group) for group in groups)} questions '
+            f'in {time.perf_counter() - started:.2f}s total'
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(groups, f)
+        else:
+            for group in groups[:20]:
+                self.stdout.write(' '.join(map(str, group)))
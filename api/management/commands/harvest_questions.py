@@ -0,0 +1,47 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from api.harvester import DEFAULT_URL, Harvester
+
+
+class Command(BaseCommand):
+    help = (
+        'Собирает вопросы с db.chgk.info параллельно, с контрольной точкой, в JSONL; '
+        'с --import сразу загружает их через import_questions'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=100, help='сколько страниц обработать всего')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--delay', type=float, default=0.0, help='пауза перед каждым запросом, с')
+        parser.add_argument('--url', default=DEFAULT_URL, help='адрес страницы; {page} — номер страницы')
+        parser.add_argument('--output', default='harvested.jsonl')
+        parser.add_argument('--checkpoint', default=None)
+        parser.add_argument('--difficulty', type=int, default=3)
+        parser.add_argument('--import', dest='import_questions', action='store_true')
+        parser.add_argument('--author', type=int, default=None, help='автор вопросов при --import')
+
+    def handle(self, *args, **options):
+        harvester = Harvester(
+            options['output'],
+            checkpoint=options['checkpoint'],
+            url=options['url'],
+            workers=options['workers'],
+            delay=options['delay'],
+            difficulty=options['difficulty'],
+        )
+
+        def progress(harvester, elapsed):
+            if harvester.pages_done % 10 == 0:
+                self.stdout.write(
+                    f'{harvester.pages_done} pages, {harvester.written} new questions, '
+                    f'{harvester.repeated} repeats, {harvester.failed} failed '
+                    f'({harvester.written / max(elapsed, 1e-9) * 3600:.0f} questions/hour)'
+                )
+
+        harvester.run(options['pages'], progress)
+        self.stdout.write(
+            f'Done: {harvester.pages_done} pages, {harvester.written} new questions written to {options["output"]}'
+        )
+        if options['import_questions']:
+            call_command('import_questions', options['output'], author=options['author'])
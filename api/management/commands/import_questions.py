@@ -0,0 +1,73 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import pack_generator, pack_pool
+from api.importer import QuestionImporter, iter_file
+from api.models import CustomUser, Pack
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковый импорт вопросов из фикстур (questions.json, pack_N.json) или JSONL '
+        'пачками через bulk_create, с отсевом дубликатов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pack', help='добавить вопросы в пак с этим названием (создаётся при отсутствии)')
+        parser.add_argument('--author', type=int, help='id автора для записей без author_q')
+        parser.add_argument('--threshold', type=float, default=None, help='порог похожести дубликатов')
+        parser.add_argument('--no-dedupe', action='store_true')
+        parser.add_argument('--dry-run', action='store_true', help='только проверить записи')
+
+    def handle(self, *args, **options):
+        if options['author'] is not None and not CustomUser.objects.filter(pk=options['author']).exists():
+            raise CommandError(f"User {options['author']} does not exist")
+
+        pack = None
+        if options['pack'] and not options['dry_run']:
+            pack, _ = Pack.objects.get_or_create(
+                name=options['pack'], author_p_id=options['author'], is_generated=False
+            )
+
+        importer = QuestionImporter(
+            batch_size=options['batch_size'],
+            pack=pack,
+            default_author_id=options['author'],
+            dedupe=not options['no_dedupe'],
+            threshold=options['threshold'],
+            dry_run=options['dry_run'],
+        )
+        started = time.perf_counter()
+        for path in options['paths']:
+            try:
+                importer.feed(iter_file(path), source=path)
+                importer.flush()
+            except (OSError, ValueError) as e:
+                raise CommandError(f'{path}: {e}')
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{path}: {importer.created} created, {importer.duplicates} duplicates, '
+                f'{len(importer.errors)} errors so far ({importer.created / max(elapsed, 1e-9):.0f} questions/s)'
+            )
+
+        if not options['dry_run']:
+            pack_pool.invalidate()
+            pack_generator.invalidate_pools()
+
+        for warning in importer.warnings[:20]:
+            self.stderr.write(warning)
+        if len(importer.warnings) > 20:
+            self.stderr.write(f'... and {len(importer.warnings) - 20} more warnings')
+        for error in importer.errors[:20]:
+            self.stderr.write(error)
+        if len(importer.errors) > 20:
+            self.stderr.write(f'... and {len(importer.errors) - 20} more errors')
+        self.stdout.write(
+            f'Imported {importer.created} questions ({importer.duplicates} duplicates skipped, '
+            f'{importer.skipped} non-question records, {len(importer.errors)} invalid, '
+            f'{len(importer.warnings)} images dropped) '
+            f'in {time.perf_counter() - started:.2f}s'
+        )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from api import leaderboard
+from api.models import RatingBucket
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает гистограмму рейтингов таблицы лидеров по всем пользователям'
+
+    def handle(self, *args, **options):
+        leaderboard.rebuild()
+        self.stdout.write(f'Rating buckets rebuilt: {RatingBucket.objects.count()}')
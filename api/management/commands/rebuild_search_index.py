@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api import search
+
+
+class Command(BaseCommand):
+    help = 'Создаёт или перестраивает полнотекстовый индекс вопросов'
+
+    def handle(self, *args, **options):
+        if search.install():
+            self.stdout.write('Search index created or repaired')
+        else:
+            search.rebuild()
+            self.stdout.write('Search index rebuilt')
@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Q
+
+from api.models import ForumMessage, ForumThread, MessageVote
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сохранённые счётчики форума и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = self.reconcile_threads(options['batch_size'])
+        self.stdout.write(f'Threads fixed: {fixed}')
+        fixed = self.reconcile_votes(options['batch_size'])
+        self.stdout.write(f'Messages fixed: {fixed}')
+
+    def reconcile_threads(self, batch_size):
+        """message_count и last_activity тем по фактическим сообщениям"""
+        fixed = 0
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                threads = list(
+                    ForumThread.objects.select_for_update()
+                    .filter(id__gt=last_id)
+                    .order_by('id')
+                    .only('id', 'created_at', 'message_count', 'last_activity')[:batch_size]
+                )
+                if not threads:
+                    return fixed
+                last_id = threads[-1].id
+                actual = {
+                    row['thread_id']: row
+                    for row in ForumMessage.objects.filter(thread_id__in=[thread.id for thread in threads])
+                    .values('thread_id')
+                    .annotate(count=Count('id'), last=Max('created_at'))
+                }
+                changed = []
+                for thread in threads:
+                    row = actual.get(thread.id, {'count': 0, 'last': None})
+                    last_activity = row['last'] or thread.created_at
+                    if thread.message_count != row['count'] or thread.last_activity != last_activity:
+                        thread.message_count = row['count']
+                        thread.last_activity = last_activity
+                        changed.append(thread)
+                ForumThread.objects.bulk_update(changed, ['message_count', 'last_activity'])
+                fixed += len(changed)
+
+    def reconcile_votes(self, batch_size):
+        """upvotes_count и downvotes_count сообщений по фактическим голосам"""
+        fixed = 0
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                messages = list(
+                    ForumMessage.objects.select_for_update()
+                    .filter(id__gt=last_id)
+                    .order_by('id')
+                    .only('id', 'upvotes_count', 'downvotes_count')[:batch_size]
+                )
+                if not messages:
+                    return fixed
+                last_id = messages[-1].id
+                actual = {
+                    row['message_id']: row
+                    for row in MessageVote.objects.filter(message_id__in=[message.id for message in messages])
+                    .values('message_id')
+                    .annotate(up=Count('id', filter=Q(vote=1)), down=Count('id', filter=Q(vote=-1)))
+                }
+                changed = []
+                for message in messages:
+                    row = actual.get(message.id, {'up': 0, 'down': 0})
+                    if message.upvotes_count != row['up'] or message.downvotes_count != row['down']:
+                        message.upvotes_count = row['up']
+                        message.downvotes_count = row['down']
+                        changed.append(message)
+                ForumMessage.objects.bulk_update(changed, ['upvotes_count', 'downvotes_count'])
+                fixed += len(changed)
@@ -0,0 +1,188 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Max, OuterRef, Q, Subquery
+
+from api import attempt_log, elo, leaderboard
+from api.elo_replay import EloReplay
+from api.models import AnswerAttempt, CustomUser, Question, UserRatingHistory
+from api.rating_history import get_mode
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает elo_rating всех пользователей и историю рейтинга, '
+        'проигрывая AnswerAttempt в хронологическом порядке. '
+        'Рейтинг, заработанный до появления журнала ответов, этим пересчётом теряется, '
+        'поэтому при его наличии команда требует --force'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100000)
+        parser.add_argument('--k-factor', type=float, default=None)
+        parser.add_argument('--question-base', type=float, default=None)
+        parser.add_argument('--difficulty-step', type=float, default=None)
+        parser.add_argument(
+            '--history-mode', choices=('answer', 'session', 'window'), default=None,
+            help='как прореживать восстановленную историю (по умолчанию RATING_HISTORY_MODE)'
+        )
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument(
+            '--force', action='store_true',
+            help='пересчитать, даже если у игроков есть рейтинг или история без ответов в журнале'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        attempt_log.flush()
+        history_mode = options['history_mode'] or get_mode()
+        window = getattr(settings, 'RATING_HISTORY_WINDOW', 300)
+
+        unbacked = self.unbacked_players()
+        if unbacked and not options['force']:
+            raise CommandError(
+                f'{unbacked} players have rating or history earned before the answer log '
+                f'(AnswerAttempt) existed; replaying would reset it. Re-run with --force to proceed.'
+            )
+
+        # ответы с id больше отметки пришли во время пересчёта и доигрываются под блокировкой
+        watermark = AnswerAttempt.objects.aggregate(last=Max('id'))['last'] or 0
+        users = list(CustomUser.objects.order_by('id').values_list('id', 'date_joined', 'elo_rating'))
+        user_ids = np.array([user_id for user_id, _, _ in users], dtype=np.int64)
+        snapshot = {user_id: rating for user_id, _, rating in users}
+
+        difficulties = {
+            question_id: calibrated if calibrated is not None else difficulty
+            for question_id, difficulty, calibrated in Question.objects.values_list(
+                'id', 'difficulty', 'calibrated_difficulty'
+            )
+        }
+        difficulty_by_id = np.full(max(difficulties, default=0) + 1, 3, dtype=np.float64)
+        for question_id, difficulty in difficulties.items():
+            difficulty_by_id[question_id] = difficulty
+
+        engine = EloReplay(
+            len(users),
+            k_factor=options['k_factor'],
+            question_base=options['question_base'],
+            difficulty_step=options['difficulty_step'],
+        )
+
+        history = {}
+        answers = 0
+        attempts = AnswerAttempt.objects.filter(id__lte=watermark).order_by('created_at', 'id').values_list(
+            'user_id', 'question_id', 'is_correct', 'session_id', 'created_at'
+        )
+        batch = []
+        for row in attempts.iterator(chunk_size=min(options['batch_size'], 10000)):
+            batch.append(row)
+            if len(batch) >= options['batch_size']:
+                answers += self.replay_batch(engine, batch, user_ids, difficulty_by_id, history, history_mode, window)
+                batch = []
+        if batch:
+            answers += self.replay_batch(engine, batch, user_ids, difficulty_by_id, history, history_mode, window)
+
+        replayed = time.perf_counter() - started
+        self.stdout.write(
+            f'Replayed {answers} answers for {len(users)} players in {replayed:.2f}s '
+            f'({answers / max(replayed, 1e-9):.0f} answers/s)'
+        )
+
+        if options['dry_run']:
+            self.stdout.write(f'Dry run: {len(history)} history rows would be written')
+            return
+
+        with transaction.atomic():
+            # игроки блокируются до записи: новые ответы ждут окончания пересчёта
+            live = dict(
+                CustomUser.objects.select_for_update().filter(id__in=snapshot)
+                .order_by('id').values_list('id', 'elo_rating')
+            )
+            late = list(
+                AnswerAttempt.objects.filter(id__gt=watermark, user_id__in=snapshot)
+                .order_by('created_at', 'id')
+                .values_list('user_id', 'question_id', 'is_correct', 'session_id', 'created_at')
+            )
+            if late:
+                answers += self.replay_batch(engine, late, user_ids, difficulty_by_id, history, history_mode, window)
+            # рейтинг изменился, а ответа в журнале нет (ещё в буфере другого процесса):
+            # такого игрока не трогаем, его пересчитает следующий запуск
+            caught_up = {row[0] for row in late}
+            skipped = {
+                user_id for user_id, rating in live.items()
+                if rating != snapshot[user_id] and user_id not in caught_up
+            }
+            written = [user_id for user_id in snapshot if user_id in live and user_id not in skipped]
+
+            ratings = dict(zip(user_ids.tolist(), engine.ratings.tolist()))
+            rows = [CustomUser(id=user_id, elo_rating=int(ratings[user_id])) for user_id in written]
+            CustomUser.objects.bulk_update(rows, ['elo_rating'], batch_size=1000)
+
+            written_set = set(written)
+            UserRatingHistory.objects.filter(user_id__in=written).delete()
+            initial = (
+                UserRatingHistory(user_id=user_id, rating=elo.INITIAL_RATING, date=date_joined)
+                for user_id, date_joined, _ in users if user_id in written_set
+            )
+            UserRatingHistory.objects.bulk_create(initial, batch_size=5000)
+            UserRatingHistory.objects.bulk_create(
+                (
+                    UserRatingHistory(user_id=user_id, rating=rating, date=date)
+                    for (user_id, _), (rating, date) in history.items() if user_id in written_set
+                ),
+                batch_size=5000,
+            )
+            leaderboard.rebuild()
+
+        if skipped:
+            self.stdout.write(
+                f'Skipped {len(skipped)} players whose rating changed during the replay '
+                f'without a logged answer yet; run the command again to include them'
+            )
+        self.stdout.write(
+            f'Ratings and history of {len(written)} players written '
+            f'in {time.perf_counter() - started:.2f}s total'
+        )
+
+    def unbacked_players(self):
+        """
+        Игроки, чей рейтинг или история не объясняются журналом ответов:
+        рейтинг не начальный без единого ответа или записи истории раньше первого ответа.
+        """
+        logged = AnswerAttempt.objects.values('user_id')
+        without_attempts = set(
+            CustomUser.objects.exclude(id__in=logged).exclude(elo_rating=elo.INITIAL_RATING)
+            .values_list('id', flat=True)
+        )
+        first_attempt = AnswerAttempt.objects.filter(user_id=OuterRef('user_id')).order_by('created_at').values('created_at')[:1]
+        before_log = set(
+            UserRatingHistory.objects.exclude(rating=elo.INITIAL_RATING)
+            .annotate(first_attempt=Subquery(first_attempt))
+            .filter(Q(first_attempt__isnull=True) | Q(date__lt=F('first_attempt')))
+            .values_list('user_id', flat=True)
+            .distinct()
+        )
+        return len(without_attempts | before_log)
+
+    def replay_batch(self, engine, batch, user_ids, difficulty_by_id, history, history_mode, window):
+        user_column, question_column, correct_column, session_column, dates = zip(*batch)
+        players = np.searchsorted(user_ids, np.fromiter(user_column, dtype=np.int64, count=len(batch)))
+        questions = np.fromiter(question_column, dtype=np.int64, count=len(batch))
+        correct = np.fromiter(correct_column, dtype=np.int8, count=len(batch))
+
+        after = engine.apply(players, difficulty_by_id[questions], correct)
+
+        # одна запись истории на ответ, сессию или окно — как при живой игре;
+        # более поздний ответ перезаписывает значение своего ключа
+        if history_mode == 'answer':
+            keys = range(len(history), len(history) + len(batch))
+        elif history_mode == 'session':
+            keys = session_column
+        else:
+            keys = (int(date.timestamp() // window) for date in dates)
+        for user_id, key, rating, date in zip(user_column, keys, after.tolist(), dates):
+            history[(user_id, key)] = (rating, date)
+        return len(batch)
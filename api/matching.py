@@ -0,0 +1,153 @@
+import re
+from functools import lru_cache
+
+# Служебные слова не влияют на зачёт ответа
+STOP_WORDS = frozenset({
+    'а', 'в', 'во', 'и', 'к', 'ко', 'на', 'о', 'об', 'обо', 'от', 'по', 'с', 'со',
+    'у', 'за', 'из', 'для', 'до', 'же', 'ли', 'то', 'это',
+    'a', 'an', 'the', 'of', 'and',
+})
+
+# Окончания для лёгкого стемминга, от длинных к коротким
+SUFFIXES = (
+    'овым', 'евым', 'иями', 'ями', 'ами', 'иях', 'ого', 'его', 'ому', 'ему',
+    'ыми', 'ими', 'ова', 'ева', 'ову', 'еву', 'ым', 'им', 'ая', 'яя', 'ое', 'ее',
+    'ие', 'ые', 'ий', 'ый', 'ой', 'ей', 'ую', 'юю', 'ом', 'ем', 'ах', 'ях', 'ам',
+    'ям', 'ов', 'ев', 'ию', 'ия', 'ье', 'ья', 'ью',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+)
+MIN_STEM_LENGTH = 3
+
+OPTIONAL_PART = re.compile(r'\[[^\]]*\]')
+ACCEPTED_PREFIX = re.compile(r'^\s*зач[её]т\s*:\s*', re.IGNORECASE)
+NON_WORD = re.compile(r'[^0-9a-zа-я]+')
+CYRILLIC_WORD = re.compile(r'^[а-я]+$')
+# Числа и римские цифры сравниваются только точно: «1812» и «1813» — разные ответы
+NUMBER = re.compile(r'\d')
+ROMAN_NUMERAL = re.compile(r'^m{0,4}(cm|cd|d?c{0,3})(xc|xl|l?x{0,3})(ix|iv|v?i{0,3})$')
+
+
+def stem(word):
+    if not CYRILLIC_WORD.match(word):
+        return word
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+            return word[:-len(suffix)]
+    return word
+
+
+@lru_cache(maxsize=65536)
+def normalize_answer(text):
+    """
+    Приводит ответ к ключу сравнения: регистр, ё/е, пунктуация и кавычки,
+    служебные слова, окончания и порядок слов не учитываются.
+    Ответ, целиком состоящий из служебных слов («В», «И»), сохраняется как есть.
+    """
+    text = (text or '').lower().replace('ё', 'е')
+    words = NON_WORD.sub(' ', text).split()
+    words = [word for word in words if word not in STOP_WORDS] or words
+    return ' '.join(sorted(stem(word) for word in words))
+
+
+@lru_cache(maxsize=65536)
+def build_answer_keys(answer_text):
+    """
+    Ключи правильного ответа. Части в квадратных скобках необязательны,
+    поэтому засчитываются и ответ без них, и ответ целиком.
+    """
+    answer_text = answer_text or ''
+    keys = [normalize_answer(OPTIONAL_PART.sub(' ', answer_text))]
+    full = normalize_answer(answer_text.replace('[', ' ').replace(']', ' '))
+    if full not in keys:
+        keys.append(full)
+    return tuple(key for key in keys if key)
+
+
+def split_accepted_answers(text):
+    """Строка «Зачёт: А; Б.» -> ['А', 'Б']"""
+    text = ACCEPTED_PREFIX.sub('', text or '').strip().rstrip('.')
+    separator = ';' if ';' in text else ','
+    return [part.strip() for part in text.split(separator) if part.strip()]
+
+
+def build_question_keys(answer_text, accepted_answers=()):
+    """Ключи основного ответа и всех зачётных вариантов без повторов"""
+    keys = list(build_answer_keys(answer_text))
+    for variant in accepted_answers or ():
+        for key in build_answer_keys(variant):
+            if key not in keys:
+                keys.append(key)
+    return tuple(keys)
+
+
+def is_exact_token(word):
+    return bool(NUMBER.search(word) or ROMAN_NUMERAL.match(word))
+
+
+def split_exact(key):
+    """Ключ -> (отсортированные числа и римские цифры, остальные слова)"""
+    exact, words = [], []
+    for word in key.split():
+        (exact if is_exact_token(word) else words).append(word)
+    return exact, ' '.join(words)
+
+
+def max_typos(key):
+    """Допустимое число опечаток зависит от длины ответа"""
+    length = len(key.replace(' ', ''))
+    if length <= 4:
+        return 0
+    if length <= 8:
+        return 1
+    return 2
+
+
+def within_distance(a, b, limit):
+    """Расстояние Левенштейна между a и b не больше limit (с ранним выходом)"""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    if limit == 0:
+        return a == b
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        best = i
+        for j, char_b in enumerate(b, 1):
+            value = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            )
+            current.append(value)
+            best = min(best, value)
+        if best > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+def match_keys(submitted, keys):
+    """
+    Проверяет ответ игрока по уже нормализованным ключам. Ответ приходит
+    из JSON: число приводится к строке, списки и объекты не засчитываются.
+    """
+    if isinstance(submitted, (int, float)) and not isinstance(submitted, bool):
+        submitted = str(submitted)
+    if not isinstance(submitted, str):
+        return False
+    candidate = normalize_answer(submitted)
+    if not candidate:
+        return False
+    if candidate in keys:
+        return True
+    # опечатки допускаются только в словах, числа должны совпасть точно
+    candidate_exact, candidate_words = split_exact(candidate)
+    for key in keys:
+        key_exact, key_words = split_exact(key)
+        if candidate_exact == key_exact and within_distance(candidate_words, key_words, max_typos(key_words)):
+            return True
+    return False
+
+
+def check_answer(question, submitted):
+    return match_keys(submitted, question.get_answer_keys())
@@ -5,10 +5,14 @@ from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
-from django.db.models import Sum, Count
-from django.db.models.signals import pre_save, post_save
+from django.db.models import Count, Q, Min, Max, F, Window
+from django.db.models.functions import FirstValue, RowNumber, Trunc
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 
+from .matching import build_question_keys
+from .game_cache import invalidate_session
+
 class CustomUser(AbstractUser):
     USERNAME_FIELD = 'username'
     email = models.EmailField(unique=True, blank=True, null=True)
@@ -18,6 +22,18 @@ class CustomUser(AbstractUser):
     date_joined = models.DateTimeField(auto_now_add=True) 
     elo_rating = models.IntegerField(default=1000)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['-elo_rating', 'id'], name='user_elo_rating_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # рейтинг на момент загрузки нужен для инкрементального обновления RatingBucket
+        instance._loaded_elo_rating = instance.__dict__.get('elo_rating')
+        return instance
+
 
 class Team(models.Model):
     name = models.TextField(default="", unique=True)
@@ -91,10 +107,12 @@ class Invitation(models.Model):
 class Question(models.Model):
     question_text = models.TextField(default="") # текст вопроса
     answer_text = models.TextField(default="") # текст ответа
+    accepted_answers = models.JSONField(default=list, blank=True) # зачётные варианты ответа
+    answer_key = models.TextField(default="", blank=True, editable=False) # нормализованные ключи ответа и зачёта (api.matching)
     question_note = models.TextField(blank=True, null=True) # комментарий
     image = models.ImageField(upload_to='media/questions', null=True)
     author_q = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="questions", null=True, blank=True)
-    pub_date_q = models.DateTimeField("date published", auto_now_add=True)
+    pub_date_q = models.DateTimeField("date published", default=timezone.now, editable=False)
 
     DIFFICULTY_CHOICES = [
         (1, 'Очень просто'),
@@ -106,12 +124,33 @@ class Question(models.Model):
 
     difficulty = models.IntegerField(choices=DIFFICULTY_CHOICES, default=1)
 
+    # статистика ответов и сложность по ней (api/calibration.py)
+    attempts_count = models.IntegerField(default=0, editable=False)
+    correct_count = models.IntegerField(default=0, editable=False)
+    calibrated_difficulty = models.FloatField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pub_date_q', 'id'], name='question_pub_date_id_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # имя картинки на момент загрузки: старый файл удаляется без повторного SELECT
+        instance._loaded_image = str(instance.__dict__.get('image') or '')
+        return instance
+
     def save(self, *args, **kwargs):
-        if self.pk:
-            old = Question.objects.get(pk=self.pk)
-            if old.image and old.image != self.image:
-                old.image.delete(save=False)
+        loaded_image = getattr(self, '_loaded_image', '')
+        if loaded_image and loaded_image != (self.image.name or ''):
+            self.image.storage.delete(loaded_image)
+        self.answer_key = '\n'.join(build_question_keys(self.answer_text, self.accepted_answers))
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'answer_text', 'accepted_answers'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'answer_key'}
         super().save(*args, **kwargs)
+        self._loaded_image = self.image.name or ''
 
     def delete(self, *args, **kwargs):
         if self.image:
@@ -130,6 +169,17 @@ class Question(models.Model):
 
     def get_answer(self):
         return self.answer_text
+
+    def get_effective_difficulty(self):
+        """Откалиброванная сложность, если она есть, иначе авторская"""
+        if self.calibrated_difficulty is not None:
+            return self.calibrated_difficulty
+        return self.difficulty
+
+    def get_answer_keys(self):
+        if self.answer_key:
+            return frozenset(self.answer_key.split('\n'))
+        return frozenset(build_question_keys(self.answer_text, self.accepted_answers))
     
     def get_authorq(self):
         return self.author_q.username if self.author_q else "Unknown"
@@ -140,12 +190,27 @@ class Question(models.Model):
     def get_note(self):
       return self.question_note  
 
+class PackQuerySet(models.QuerySet):
+    def with_summary(self):
+        """Число вопросов и гистограмма сложности одним агрегирующим запросом"""
+        histogram = {
+            f'difficulty_{level}_count': Count('questions', filter=Q(questions__difficulty=level))
+            for level, _ in Question.DIFFICULTY_CHOICES
+        }
+        return self.select_related('author_p').annotate(
+            questions_count=Count('questions'),
+            **histogram
+        )
+
 class Pack(models.Model):
     name = models.TextField(default="Name")
     questions = models.ManyToManyField(Question, related_name="questions")
     author_p = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="packs", null=True, blank=True)
     description = models.TextField(default="", null=True, blank=True)
     pub_date_p = models.DateTimeField("date published", auto_now_add=True)
+    is_generated = models.BooleanField(default=False) # собран генератором игр (api/pack_generator.py), в списках не показывается
+
+    objects = PackQuerySet.as_manager()
     
     def get_authorp(self):
         return self.author_p.username if self.author_p else "Unknown"
@@ -163,38 +228,195 @@ class GameSession(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="game_sessions")
     pack = models.ForeignKey(Pack, on_delete=models.CASCADE, related_name="game_sessions")
     questions = models.ManyToManyField(Question, related_name="game_sessions")
+    # упорядоченный снимок id вопросов сессии: текущий вопрос = question_ids[current_question_index]
+    question_ids = models.JSONField(default=list, blank=True)
     current_question_index = models.IntegerField(default=0)
     is_completed = models.BooleanField(default=False)
     correct_answers = models.IntegerField(default=0)
+    calibrated = models.BooleanField(default=False) # ответы сессии учтены в калибровке сложности
+    question_shown_at = models.DateTimeField(null=True, blank=True) # когда показан текущий вопрос
+    # итог игры хранится в самой сессии и дописывается при каждом ответе
+    rating_before = models.IntegerField(null=True, blank=True)
+    rating_after = models.IntegerField(null=True, blank=True)
+    outcomes = models.JSONField(default=list, blank=True) # [{question_id, is_correct, rating_change}, ...]
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
 
-    def get_current_question(self):
-        questions = list(self.questions.all())
-        if 0 <= self.current_question_index < len(questions):
-            return questions[self.current_question_index]
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'pack', 'is_completed', 'created_at'], name='gamesession_active_idx'),
+            models.Index(
+                fields=['id'],
+                name='gamesession_uncalibrated_idx',
+                condition=models.Q(is_completed=True, calibrated=False),
+            ),
+            models.Index(
+                fields=['user', '-completed_at', '-id'],
+                name='gamesession_history_idx',
+                condition=models.Q(is_completed=True),
+            ),
+        ]
+
+    def set_questions(self, question_ids):
+        self.question_ids = list(question_ids)
+        self.question_shown_at = timezone.now()
+        self.save(update_fields=['question_ids', 'question_shown_at'])
+        self.questions.set(self.question_ids)
+
+    def get_question_ids(self):
+        # сессии, созданные до появления снимка, заполняем один раз из M2M
+        if not self.question_ids and self.pk:
+            ids = list(self.questions.order_by('id').values_list('id', flat=True))
+            if ids:
+                self.question_ids = ids
+                GameSession.objects.filter(pk=self.pk).update(question_ids=ids)
+        return self.question_ids
+
+    def get_questions_count(self):
+        return len(self.get_question_ids())
+
+    def get_current_question_id(self):
+        question_ids = self.get_question_ids()
+        if 0 <= self.current_question_index < len(question_ids):
+            return question_ids[self.current_question_index]
         return None
 
+    def get_current_question(self):
+        question_id = self.get_current_question_id()
+        if question_id is None:
+            return None
+        return Question.objects.filter(pk=question_id).first()
+
+    def record_outcome(self, question_id, is_correct, rating_change, rating):
+        """Дописывает результат ответа; rating — рейтинг игрока после ответа"""
+        if self.rating_before is None:
+            self.rating_before = rating - rating_change
+        self.rating_after = rating
+        if is_correct:
+            self.correct_answers += 1
+        self.outcomes = list(self.outcomes or []) + [{
+            'question_id': question_id,
+            'is_correct': is_correct,
+            'rating_change': rating_change,
+        }]
+        self.save(update_fields=['correct_answers', 'rating_before', 'rating_after', 'outcomes', 'updated_at'])
+
     def move_to_next_question(self):
+        """
+        Переход к следующему вопросу условным UPDATE: строка меняется, только если
+        в базе сессия всё ещё на том же вопросе и не завершена. Если её уже сдвинул
+        другой процесс (устаревший кэш, повтор запроса), состояние перечитывается
+        из базы и побочные эффекты (просмотренные вопросы, история) не повторяются.
+        """
         if self.is_completed:
             return None
 
-        questions = list(self.questions.all().order_by('id'))
-        next_index = self.current_question_index + 1
+        from .seen_questions import mark_seen
 
-        if next_index < len(questions):
-            self.current_question_index = next_index
-            self.save()
-            return questions[self.current_question_index]
+        expected = self.current_question_index
+        answered_id = self.get_current_question_id()
+        next_index = expected + 1
+        now = timezone.now()
+        current = GameSession.objects.filter(pk=self.pk, current_question_index=expected, is_completed=False)
+
+        if next_index < self.get_questions_count():
+            updated = current.update(current_question_index=next_index, question_shown_at=now, updated_at=now)
+            if updated:
+                self.current_question_index, self.question_shown_at, self.updated_at = next_index, now, now
         else:
-            self.is_completed = True
-            self.save()
+            updated = current.update(is_completed=True, completed_at=now, updated_at=now)
+            if updated:
+                self.is_completed, self.completed_at, self.updated_at = True, now, now
+        invalidate_session(self.user_id, self.pack_id)
+
+        if not updated:
+            self.refresh_from_db(fields=[
+                'current_question_index', 'question_shown_at', 'is_completed', 'completed_at', 'updated_at',
+            ])
+            return None if self.is_completed else self.get_current_question()
+
+        mark_seen(self.user_id, [answered_id])
+        if self.is_completed:
+            from .rating_history import record_session_completed
+
+            record_session_completed(self)
             return None
+        return self.get_current_question()
 
     def __str__(self):
         return f"{self.user.username} - {self.pack.name}"
 
 
+class AnswerAttempt(models.Model):
+    """
+    Ответ игрока на вопрос в игровой сессии. Журнал только пополняется
+    (см. api/attempt_log.py); по нему пересчитываются рейтинг и сложность.
+    """
+    session = models.ForeignKey(GameSession, on_delete=models.CASCADE, related_name="attempts")
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="answer_attempts")
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name="attempts")
+    is_correct = models.BooleanField()
+    rating_change = models.IntegerField(default=0)
+    submitted_answer = models.TextField(blank=True, default="")
+    latency_ms = models.PositiveIntegerField(null=True, blank=True) # от показа вопроса до ответа
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='attempt_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("AnswerAttempt is append-only")
+        super().save(*args, **kwargs)
+
+
+class QuestionSignature(models.Model):
+    """MinHash-подпись текста вопроса для поиска дубликатов (api/duplicates.py)"""
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name="signature")
+    signature = models.BinaryField()
+
+
+class QuestionLshBucket(models.Model):
+    """LSH-корзина полосы подписи: вопросы с одинаковым key — кандидаты в дубликаты"""
+    key = models.BigIntegerField()
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name="lsh_buckets")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['key', 'question'], name='lsh_bucket_key_idx'),
+        ]
+
+
+class ReviewItem(models.Model):
+    """Вопрос в очереди тренировки игрока (интервальные повторения SM-2, api/training.py)"""
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="review_items")
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name="review_items")
+    repetitions = models.IntegerField(default=0)
+    interval_days = models.IntegerField(default=0)
+    ease_factor = models.FloatField(default=2.5)
+    lapses = models.IntegerField(default=0)
+    due_at = models.DateTimeField(default=timezone.now)
+    last_reviewed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'question'], name='review_item_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'due_at'], name='review_due_idx'),
+        ]
+
+
+class SeenQuestions(models.Model):
+    """Вопросы, которые игрок уже видел: сжатая битовая карта по id (api/seen_questions.py)"""
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name="seen_questions")
+    bitmap = models.BinaryField(default=b'')
+    updated_at = models.DateTimeField(auto_now=True)
+
+
 class ForumThread(models.Model):
     title = models.CharField(max_length=200)
     created_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
@@ -202,10 +424,41 @@ class ForumThread(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_closed = models.BooleanField(default=False)
     message_count = models.IntegerField(default=0)  
+    last_activity = models.DateTimeField(default=timezone.now) # время последнего сообщения (или создания темы)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-last_activity', '-id'], name='thread_last_activity_idx'),
+        ]
 
     def get_all_messages(self):
         return self.messages.select_related('author').prefetch_related('replies').all()
 
+    def get_message_tree(self):
+        """
+        Все сообщения темы одним запросом, дерево ответов собирается в памяти.
+        Возвращает (корневые сообщения, {id сообщения: [ответы]}) в порядке создания.
+        """
+        messages = list(self.messages.select_related('author').order_by('created_at', 'id'))
+        by_id = {message.id: message for message in messages}
+        roots, replies = [], {}
+        for message in messages:
+            parent = by_id.get(message.parent_message_id)
+            if parent is not None:
+                message.parent_message = parent
+                replies.setdefault(parent.id, []).append(message)
+            elif message.parent_message_id is None:
+                roots.append(message)
+        return roots, replies
+
+    def get_user_votes(self, user):
+        """Голоса пользователя за сообщения темы: {id сообщения: голос}"""
+        if not user.is_authenticated:
+            return {}
+        return dict(
+            MessageVote.objects.filter(user=user, message__thread_id=self.pk).values_list('message_id', 'vote')
+        )
+
     def __str__(self):
         return self.title
 
@@ -226,8 +479,32 @@ class ForumMessage(models.Model):
         super().save(*args, **kwargs)
         
         if is_new:
-            self.thread.message_count = self.thread.messages.count()
-            self.thread.save(update_fields=['message_count'])
+            # счётчик и время активности обновляются одним UPDATE без пересчёта сообщений
+            ForumThread.objects.filter(pk=self.thread_id).update(
+                message_count=F('message_count') + 1,
+                last_activity=self.created_at,
+                updated_at=timezone.now(),
+            )
+
+    @property
+    def rating(self):
+        return self.upvotes_count - self.downvotes_count
+
+    def apply_vote(self, old_vote, new_vote):
+        """
+        Сдвигает счётчики голосов на разницу между старым и новым голосом
+        (None — голоса нет) одним UPDATE с F() и перечитывает их.
+        """
+        delta_up = (new_vote == 1) - (old_vote == 1)
+        delta_down = (new_vote == -1) - (old_vote == -1)
+        if delta_up or delta_down:
+            ForumMessage.objects.filter(pk=self.pk).update(
+                upvotes_count=F('upvotes_count') + delta_up,
+                downvotes_count=F('downvotes_count') + delta_down,
+            )
+        self.upvotes_count, self.downvotes_count = ForumMessage.objects.filter(pk=self.pk).values_list(
+            'upvotes_count', 'downvotes_count'
+        ).get()
 
     def get_user_vote(self, user):
         
@@ -256,22 +533,25 @@ class MessageVote(models.Model):
     def __str__(self):
         return f"{self.user.username} voted {self.get_vote_display()} for message #{self.message.id}"
     
-    def save(self, *args, **kwargs):                                                
-        created = not self.pk
-        old_vote = None
-        if not created:
-            old_vote = MessageVote.objects.get(pk=self.pk).vote
-        
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # голос на момент загрузки: при сохранении счётчики сдвигаются на разницу
+        instance._loaded_vote = instance.__dict__.get('vote')
+        return instance
+
+    def save(self, *args, **kwargs):
+        old_vote = getattr(self, '_loaded_vote', None) if self.pk else None
         super().save(*args, **kwargs)
-      
-        self.message.rating = self.message.votes.aggregate(
-            Sum('vote')
-        )['vote__sum'] or 0
-        
-        self.message.upvotes_count = self.message.votes.filter(vote=1).count()
-        self.message.downvotes_count = self.message.votes.filter(vote=-1).count()
-        self.message.save()
-        
+        self._loaded_vote = self.vote
+        self.message.apply_vote(old_vote, self.vote)
+
+    def delete(self, *args, **kwargs):
+        old_vote = getattr(self, '_loaded_vote', self.vote)
+        result = super().delete(*args, **kwargs)
+        self.message.apply_vote(old_vote, None)
+        return result
+
 class TeamMember(models.Model):
     ROLES = [
         ('CAPTAIN', 'Captain'),
@@ -287,17 +567,123 @@ class TeamMember(models.Model):
     class Meta:
         unique_together = ('user', 'team')
 
+class UserRatingHistoryQuerySet(models.QuerySet):
+    def bucketed(self, resolution):
+        """
+        Свечи open/close/min/max по интервалам resolution, агрегированные в базе.
+        Отложенные записи (окна истории, буферы разных процессов) вставляются
+        не по порядку времени, поэтому первая и последняя запись интервала
+        выбираются оконными функциями по (date, id), а не по id.
+        """
+        bucket = {'partition_by': F('bucket')}
+        chronological = [F('date').asc(), F('id').asc()]
+        return list(
+            self.annotate(bucket=Trunc('date', resolution))
+            .annotate(
+                open=Window(FirstValue('rating'), order_by=chronological, **bucket),
+                close=Window(FirstValue('rating'), order_by=[F('date').desc(), F('id').desc()], **bucket),
+                min=Window(Min('rating'), **bucket),
+                max=Window(Max('rating'), **bucket),
+                count=Window(Count('id'), **bucket),
+                row=Window(RowNumber(), order_by=chronological, **bucket),
+            )
+            .filter(row=1)
+            .values('bucket', 'open', 'close', 'min', 'max', 'count')
+            .order_by('bucket')
+        )
+
 class UserRatingHistory(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='rating_history')
     rating = models.IntegerField()
-    date = models.DateTimeField(auto_now_add=True)
+    # не auto_now_add: отложенные и пересчитанные записи сохраняют собственное время
+    date = models.DateTimeField(default=timezone.now)
+
+    RESOLUTIONS = ('hour', 'day', 'week')
+
+    objects = UserRatingHistoryQuerySet.as_manager()
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['user', 'date'], name='ratinghistory_user_date_idx'),
+        ]
+
+class RatingBucket(models.Model):
+    """Гистограмма рейтингов для таблицы лидеров (api/leaderboard.py): сколько игроков имеют данный elo_rating"""
+    rating = models.IntegerField(primary_key=True)
+    players = models.IntegerField(default=0)
 
 @receiver(post_save, sender=CustomUser)
 def save_rating_history(sender, instance, **kwargs):
+    from .rating_history import record
+
     update_fields = kwargs.get('update_fields') or set()
-    if kwargs.get('created', False) or 'elo_rating' in update_fields:
+    if kwargs.get('created', False):
         UserRatingHistory.objects.create(user=instance, rating=instance.elo_rating)
-       
\ No newline at end of file
+    elif 'elo_rating' in update_fields:
+        record(instance.pk, instance.elo_rating)
+
+@receiver([post_save, post_delete], sender=GameSession)
+def invalidate_game_session_cache(sender, instance, **kwargs):
+    invalidate_session(instance.user_id, instance.pack_id)
+
+@receiver(m2m_changed, sender=Pack.questions.through)
+def invalidate_pack_pool_on_questions(sender, instance, action, **kwargs):
+    from .pack_pool import invalidate
+
+    if action in ('post_add', 'post_remove', 'post_clear') and not getattr(instance, 'is_generated', False):
+        invalidate()
+
+@receiver(post_delete, sender=Pack)
+def invalidate_pack_pool(sender, instance, **kwargs):
+    from .pack_pool import invalidate
+
+    if not instance.is_generated:
+        invalidate()
+
+@receiver(post_delete, sender=Question)
+def invalidate_question_pools_on_delete(sender, instance, **kwargs):
+    from .pack_pool import invalidate
+    from .pack_generator import invalidate_pools
+
+    invalidate()
+    invalidate_pools()
+
+@receiver(post_save, sender=Question)
+def invalidate_question_pools(sender, instance, created, update_fields=None, **kwargs):
+    from .pack_pool import invalidate
+    from .pack_generator import invalidate_pools
+
+    if created:
+        invalidate_pools()
+    elif update_fields is None or 'difficulty' in update_fields:
+        invalidate()
+        invalidate_pools()
+
+@receiver(post_save, sender=Question)
+def update_question_signature(sender, instance, created, update_fields=None, **kwargs):
+    from .duplicates import index_question
+
+    if created or update_fields is None or 'question_text' in update_fields:
+        index_question(instance)
+
+@receiver(post_save, sender=CustomUser)
+def update_rating_buckets(sender, instance, created, update_fields=None, **kwargs):
+    from .leaderboard import move_player
+
+    if 'elo_rating' not in instance.__dict__:
+        return
+    if created:
+        move_player(None, instance.elo_rating)
+    elif update_fields is None or 'elo_rating' in update_fields:
+        old_rating = getattr(instance, '_loaded_elo_rating', None)
+        if old_rating is not None:
+            move_player(old_rating, instance.elo_rating)
+    instance._loaded_elo_rating = instance.elo_rating
+
+@receiver(post_delete, sender=CustomUser)
+def remove_from_rating_buckets(sender, instance, **kwargs):
+    from .leaderboard import move_player
+
+    if 'elo_rating' in instance.__dict__:
+        move_player(instance.__dict__.get('_loaded_elo_rating', instance.elo_rating), None)
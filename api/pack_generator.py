@@ -0,0 +1,139 @@
+import random
+
+from django.conf import settings
+from django.db import transaction
+
+from .game_cache import get_game_cache
+from .models import GameSession, Pack, Question
+from .seen_questions import get_seen
+
+# Пулы id вопросов по уровню сложности (с учётом калибровки). Строятся одним
+# проходом по таблице, хранятся в кэше по ключу на уровень и сбрасываются
+# при изменении вопросов, поэтому сборка игры не сканирует Question.
+LEVELS = tuple(level for level, _ in Question.DIFFICULTY_CHOICES)
+POOL_KEY = 'game:question_pool:{}'
+CURVES = ('flat', 'ramp')
+MAX_QUESTIONS = 100
+
+
+def get_timeout():
+    return getattr(settings, 'QUESTION_POOL_CACHE_TIMEOUT', 10 * 60)
+
+
+def clamp_level(level):
+    return min(LEVELS[-1], max(LEVELS[0], int(level)))
+
+
+def difficulty_level(question_difficulty, calibrated_difficulty):
+    difficulty = calibrated_difficulty if calibrated_difficulty is not None else question_difficulty
+    return clamp_level(difficulty + 0.5)
+
+
+def build_pools():
+    pools = {level: [] for level in LEVELS}
+    rows = Question.objects.order_by().values_list('id', 'difficulty', 'calibrated_difficulty')
+    for question_id, difficulty, calibrated in rows.iterator(chunk_size=10000):
+        pools[difficulty_level(difficulty, calibrated)].append(question_id)
+    get_game_cache().set_many({POOL_KEY.format(level): ids for level, ids in pools.items()}, get_timeout())
+    return pools
+
+
+def get_pools():
+    keys = {POOL_KEY.format(level): level for level in LEVELS}
+    cached = get_game_cache().get_many(keys)
+    if len(cached) < len(keys):
+        return build_pools()
+    return {keys[key]: ids for key, ids in cached.items()}
+
+
+def invalidate_pools():
+    get_game_cache().delete_many([POOL_KEY.format(level) for level in LEVELS])
+
+
+def difficulty_curve(curve, count, difficulty=3):
+    """
+    Уровень сложности для каждой позиции игры: 'flat' — все вопросы
+    уровня difficulty, 'ramp' — от самого лёгкого к самому сложному,
+    список — уровни заданы явно.
+    """
+    if isinstance(curve, (list, tuple)):
+        return [clamp_level(level) for level in curve][:MAX_QUESTIONS]
+    difficulty = clamp_level(difficulty)
+    if curve == 'ramp':
+        if count == 1:
+            return [difficulty]
+        low, high = LEVELS[0], LEVELS[-1]
+        return [round(low + (high - low) * i / (count - 1)) for i in range(count)]
+    return [difficulty] * count
+
+
+def sample_excluding(pool, count, used, seen):
+    if count <= 0 or not pool:
+        return []
+    # обычно хватает одной выборки с запасом; полный проход — только если
+    # большая часть пула уже исключена
+    picked = [
+        qid for qid in random.sample(pool, min(len(pool), count * 2 + 8))
+        if qid not in used and qid not in seen
+    ]
+    if len(picked) < count:
+        rest = [qid for qid in pool if qid not in used and qid not in seen]
+        picked = random.sample(rest, min(len(rest), count))
+    return picked[:count]
+
+
+def pick_questions(levels, seen=()):
+    """
+    Подбирает вопросы под кривую сложности. Если на уровне не хватает
+    новых вопросов, недостающие берутся с ближайших уровней.
+    """
+    pools = get_pools()
+    used = set()
+    by_level = {}
+    for level in LEVELS:
+        need = levels.count(level)
+        ids = sample_excluding(pools[level], need, used, seen)
+        used.update(ids)
+        by_level[level] = ids
+
+    result = []
+    for level in levels:
+        if not by_level[level]:
+            for neighbour in sorted(LEVELS, key=lambda other: (abs(other - level), other)):
+                ids = sample_excluding(pools[neighbour], 1, used, seen)
+                if ids:
+                    used.update(ids)
+                    by_level[level].extend(ids)
+                    break
+        if by_level[level]:
+            result.append(by_level[level].pop())
+    return result
+
+
+def generate_game(user, count=36, curve='flat', difficulty=3):
+    """
+    Собирает игру из вопросов, которые пользователь ещё не видел, и
+    запускает сессию по сгенерированному паку. Возвращает сессию или None,
+    если подходящих вопросов нет.
+    """
+    levels = difficulty_curve(curve, count, difficulty)
+    question_ids = pick_questions(levels, get_seen(user.pk))
+    if not question_ids:
+        return None
+
+    with transaction.atomic():
+        pack = Pack.objects.create(
+            name=f"Сгенерированная игра ({len(question_ids)})",
+            author_p=user,
+            is_generated=True,
+        )
+        pack.questions.set(question_ids)
+        session = GameSession.objects.create(
+            user=user,
+            pack=pack,
+            correct_answers=0,
+            current_question_index=0,
+            rating_before=user.elo_rating,
+        )
+        session.set_questions(question_ids)
+    return session
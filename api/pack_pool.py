@@ -0,0 +1,86 @@
+import random
+
+from django.conf import settings
+from django.db.models import Avg, Count, FloatField
+from django.db.models.functions import Coalesce
+
+from .game_cache import get_game_cache
+from .models import GameSession, Pack
+
+# Пул играбельных (непустых) паков для случайной игры: параллельные списки
+# id и средней сложности вопросов. Строится одним агрегирующим запросом,
+# хранится в кэше и сбрасывается сигналами при изменении состава паков.
+POOL_KEY = 'game:pack_pool'
+
+
+def get_timeout():
+    return getattr(settings, 'PACK_POOL_CACHE_TIMEOUT', 10 * 60)
+
+
+def build_pool():
+    rows = (
+        Pack.objects.annotate(
+            size=Count('questions'),
+            difficulty=Avg(
+                Coalesce('questions__calibrated_difficulty', 'questions__difficulty', output_field=FloatField())
+            ),
+        )
+        .filter(size__gt=0, is_generated=False)
+        .order_by('id')
+        .values_list('id', 'difficulty')
+    )
+    ids, difficulties = [], []
+    for pack_id, difficulty in rows:
+        ids.append(pack_id)
+        difficulties.append(difficulty)
+    return ids, difficulties
+
+
+def get_pool():
+    pool = get_game_cache().get(POOL_KEY)
+    if pool is None:
+        pool = build_pool()
+        get_game_cache().set(POOL_KEY, pool, get_timeout())
+    return pool
+
+
+def invalidate():
+    get_game_cache().delete(POOL_KEY)
+
+
+def played_pack_ids(user):
+    return set(GameSession.objects.filter(user=user).values_list('pack_id', flat=True).distinct())
+
+
+def pick_random_pack_id(user=None, min_difficulty=None, max_difficulty=None):
+    """
+    Случайный непустой пак в диапазоне средней сложности [min, max].
+    Паки, которые пользователь уже играл, пропускаются; если непройденных
+    не осталось, выбор идёт из всех подходящих. Возвращает None, если
+    подходящих паков нет.
+    """
+    ids, difficulties = get_pool()
+    low = float('-inf') if min_difficulty is None else min_difficulty
+    high = float('inf') if max_difficulty is None else max_difficulty
+    if low == float('-inf') and high == float('inf'):
+        candidates = ids
+    else:
+        candidates = [
+            pack_id for pack_id, difficulty in zip(ids, difficulties)
+            if low <= difficulty <= high
+        ]
+    if not candidates:
+        return None
+
+    if user is not None and user.is_authenticated:
+        played = played_pack_ids(user)
+        if played:
+            # пока сыграна малая часть паков, несколько случайных попыток дешевле полного фильтра
+            for _ in range(8):
+                pack_id = random.choice(candidates)
+                if pack_id not in played:
+                    return pack_id
+            unplayed = [pack_id for pack_id in candidates if pack_id not in played]
+            if unplayed:
+                return random.choice(unplayed)
+    return random.choice(candidates)
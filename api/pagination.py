@@ -0,0 +1,147 @@
+import base64
+import json
+from urllib import parse
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная (keyset) пагинация по составному ключу сортировки.
+
+    Курсор хранит значения полей `ordering` последней/первой строки страницы,
+    поэтому следующая страница выбирается условием `WHERE (a, b) > (x, y)`
+    по индексу, а не через OFFSET — время ответа не зависит от глубины.
+    """
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering = ('id',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = getattr(view, 'ordering', None) or self.ordering
+        self.page_size = self.get_page_size(request)
+        self.fields = [
+            queryset.model._meta.get_field(name.lstrip('-'))
+            for name in self.ordering
+        ]
+
+        direction, position = self.decode_cursor(request)
+        reverse = direction == 'p'
+
+        if position is not None:
+            queryset = queryset.filter(self._seek_filter(position, reverse))
+        queryset = queryset.order_by(*self._order_by(reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Для обратного прохода "ещё" означает наличие предыдущих строк
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = position is not None if not reverse else has_more
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link('n', self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._link('p', self.page[0])
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return 'n', None
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            if direction not in ('n', 'p') or len(values) != len(self.fields):
+                raise ValueError
+            position = [field.to_python(value) for field, value in zip(self.fields, values)]
+        except Exception:
+            raise NotFound('Invalid cursor')
+        return direction, position
+
+    def encode_cursor(self, direction, obj):
+        values = [field.value_to_string(obj) for field in self.fields]
+        raw = json.dumps([direction, values], separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def _link(self, direction, obj):
+        url = self.request.build_absolute_uri()
+        scheme, netloc, path, query, fragment = parse.urlsplit(url)
+        params = parse.parse_qs(query, keep_blank_values=True)
+        params[self.cursor_query_param] = [self.encode_cursor(direction, obj)]
+        query = parse.urlencode(sorted(params.items()), doseq=True)
+        return parse.urlunsplit((scheme, netloc, path, query, fragment))
+
+    def _order_by(self, reverse):
+        if not reverse:
+            return list(self.ordering)
+        return [name[1:] if name.startswith('-') else '-' + name for name in self.ordering]
+
+    def _seek_filter(self, position, reverse):
+        # (a, b, c) > (x, y, z)  ==  a > x OR (a = x AND (b > y OR (b = y AND c > z)))
+        condition = None
+        for name, value in reversed(list(zip(self.ordering, position))):
+            descending = name.startswith('-') != reverse
+            lookup = '%s__%s' % (name.lstrip('-'), 'lt' if descending else 'gt')
+            step = Q(**{lookup: value})
+            if condition is not None:
+                step |= Q(**{name.lstrip('-'): value}) & condition
+            condition = step
+        # избыточная граница по первому полю: без неё OR не превращается
+        # в диапазон индекса и каждая страница просматривает все предыдущие строки
+        name, value = self.ordering[0], position[0]
+        descending = name.startswith('-') != reverse
+        bound = Q(**{'%s__%s' % (name.lstrip('-'), 'lte' if descending else 'gte'): value})
+        return bound & condition
+
+
+class QuestionCursorPagination(KeysetPagination):
+    ordering = ('pub_date_q', 'id')
+
+
+class ThreadPagination(KeysetPagination):
+    ordering = ('-last_activity', '-id')
+
+
+class GameHistoryPagination(KeysetPagination):
+    page_size = 20
+    ordering = ('-completed_at', '-id')
@@ -0,0 +1,175 @@
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .flusher import PeriodicFlusher, bulk_write, requeue
+from .models import CustomUser, UserRatingHistory
+
+logger = logging.getLogger(__name__)
+
+# RATING_HISTORY_MODE:
+#   'answer'  — запись на каждое изменение рейтинга (прежнее поведение)
+#   'session' — одна запись по завершении игровой сессии
+#   'window'  — последнее значение за окно RATING_HISTORY_WINDOW секунд,
+#               записи копятся в памяти процесса и пишутся через bulk_create;
+#               закончившиеся окна раз в RATING_HISTORY_FLUSH_INTERVAL секунд
+#               пишет фоновый поток. Буфер процесса теряется при его аварийном
+#               завершении — не больше одного окна истории на игрока.
+#               Записи удалённых пользователей при сбросе отбрасываются,
+#               пока база недоступна, буфер держит не больше
+#               RATING_HISTORY_MAX_BUFFER закрытых окон.
+MODES = ('answer', 'session', 'window')
+
+
+def get_mode():
+    mode = getattr(settings, 'RATING_HISTORY_MODE', 'answer')
+    return mode if mode in MODES else 'answer'
+
+
+class RatingHistoryBuffer:
+    references = {'user_id': CustomUser}
+
+    def __init__(self, window, batch_size, max_rows=10000):
+        self.window = window
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        self.lock = threading.Lock()
+        self.pending = {}  # user_id -> (номер окна, rating, date)
+        self.closed = []
+        self.last_sweep = None
+
+    def add(self, user_id, rating, now=None):
+        now = now or timezone.now()
+        index = self._window_index(now)
+        with self.lock:
+            previous = self.pending.get(user_id)
+            if previous and previous[0] != index:
+                self.closed.append(self._row(user_id, previous))
+            self.pending[user_id] = (index, rating, now)
+
+            swept = self.last_sweep is None or (now - self.last_sweep).total_seconds() >= self.window
+            if swept:
+                self._sweep(index)
+                self.last_sweep = now
+            rows = self._take(force=swept)
+        self._write(rows)
+
+    def flush_closed(self, now=None):
+        """Пишет окна, которые уже закончились; текущие остаются в буфере"""
+        now = now or timezone.now()
+        with self.lock:
+            self._sweep(self._window_index(now))
+            self.last_sweep = now
+            rows = self._take(force=True)
+        self._write(rows)
+
+    def flush_user(self, user_id):
+        with self.lock:
+            previous = self.pending.pop(user_id, None)
+            if previous:
+                self.closed.append(self._row(user_id, previous))
+            rows = self._take(force=True)
+        self._write(rows)
+
+    def flush(self):
+        with self.lock:
+            for user_id, previous in self.pending.items():
+                self.closed.append(self._row(user_id, previous))
+            self.pending.clear()
+            rows = self._take(force=True)
+        self._write(rows)
+
+    def _window_index(self, now):
+        return int(now.timestamp() // self.window)
+
+    def _sweep(self, index):
+        # окна, которые уже закончились, больше не изменятся
+        for user_id, previous in list(self.pending.items()):
+            if previous[0] < index:
+                self.closed.append(self._row(user_id, previous))
+                del self.pending[user_id]
+
+    def _take(self, force):
+        if not self.closed or (not force and len(self.closed) < self.batch_size):
+            return []
+        rows, self.closed = self.closed, []
+        return rows
+
+    def _row(self, user_id, entry):
+        _, rating, date = entry
+        return UserRatingHistory(user_id=user_id, rating=rating, date=date)
+
+    def _write(self, rows):
+        if not rows:
+            return
+        try:
+            bulk_write(UserRatingHistory, rows, self.batch_size, self.references)
+        except Exception:
+            # строки возвращаются в буфер, следующий сброс попробует снова
+            with self.lock:
+                self.closed = requeue(self.closed, rows, self.max_rows, 'rating history')
+            raise
+
+
+buffer = RatingHistoryBuffer(
+    window=getattr(settings, 'RATING_HISTORY_WINDOW', 300),
+    batch_size=getattr(settings, 'RATING_HISTORY_BATCH_SIZE', 500),
+    max_rows=getattr(settings, 'RATING_HISTORY_MAX_BUFFER', 10000),
+)
+flusher = PeriodicFlusher(
+    'rating-history-flush', getattr(settings, 'RATING_HISTORY_FLUSH_INTERVAL', 60), buffer.flush_closed
+)
+
+
+def record(user_id, rating):
+    """
+    Вызывается при каждом изменении elo_rating. В режиме 'window' значение
+    попадает в буфер только после коммита: откатившийся рейтинг не должен
+    остаться в истории, а запись чужих окон — оказаться в транзакции запроса.
+    """
+    mode = get_mode()
+    if mode == 'answer':
+        UserRatingHistory.objects.create(user_id=user_id, rating=rating)
+    elif mode == 'window':
+        now = timezone.now()
+        transaction.on_commit(lambda: add(user_id, rating, now), robust=True)
+
+
+def add(user_id, rating, now=None):
+    """Рейтинг уже сохранён, поэтому ошибка записи истории не должна дойти до запроса"""
+    flusher.ensure_started()
+    try:
+        buffer.add(user_id, rating, now)
+    except Exception:
+        logger.exception('rating history: flush failed, rows kept in buffer')
+
+
+def flush_user(user_id):
+    try:
+        buffer.flush_user(user_id)
+    except Exception:
+        logger.exception('rating history: flush failed, rows kept in buffer')
+
+
+def flush():
+    try:
+        buffer.flush()
+    except Exception:
+        logger.exception('rating history: flush failed, rows kept in buffer')
+
+
+def record_session_completed(session):
+    """Вызывается, когда игровая сессия завершена"""
+    mode = get_mode()
+    if mode == 'session':
+        rating = CustomUser.objects.values_list('elo_rating', flat=True).get(pk=session.user_id)
+        UserRatingHistory.objects.create(user_id=session.user_id, rating=rating)
+    elif mode == 'window':
+        transaction.on_commit(lambda: flush_user(session.user_id), robust=True)
+
+
+atexit.register(flush)
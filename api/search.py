@@ -0,0 +1,187 @@
+import re
+
+from django.db import connection
+
+from .matching import STOP_WORDS, stem
+from .models import Question
+
+# Полнотекстовый поиск по вопросам. Индекс живёт в базе и обновляется ею же,
+# поэтому остаётся согласованным при save/delete, bulk_create и raw SQL:
+#   PostgreSQL — генерируемый столбец tsvector (словарь 'russian') с GIN-индексом;
+#   SQLite     — таблица FTS5 без копии текста, триггеры на api_question. Морфологии
+#                в FTS5 нет, поэтому слова запроса стеммятся (api/matching.py)
+#                и ищутся по префиксу.
+# Структуры создаются install() после каждого migrate (см. ApiConfig.ready):
+# миграция, пересоздающая api_question в SQLite, удаляет и её триггеры.
+
+FTS_TABLE = 'api_question_fts'
+SEARCH_COLUMN = 'search_vector'
+SEARCH_INDEX = 'question_search_idx'
+SQLITE_TRIGGERS = tuple(f'{FTS_TABLE}_{suffix}' for suffix in ('ai', 'ad', 'au'))
+WORD = re.compile(r'\w+')
+_installed = None  # только для выбора способа поиска; install() проверяет базу заново
+
+POSTGRES_INSTALL = (
+    f"""
+    ALTER TABLE api_question ADD COLUMN IF NOT EXISTS {SEARCH_COLUMN} tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(question_text, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(answer_text, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(question_note, '')), 'C')
+    ) STORED
+    """,
+    f"CREATE INDEX IF NOT EXISTS {SEARCH_INDEX} ON api_question USING GIN ({SEARCH_COLUMN})",
+)
+
+def _folded(column):
+    # unicode61 не отождествляет «ё» и «е», поэтому индексируется уже приведённый текст
+    return f"replace(replace(coalesce({column}, ''), 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _row(prefix):
+    return ', '.join(_folded(f'{prefix}{column}') for column in ('question_text', 'answer_text', 'question_note'))
+
+
+SQLITE_REBUILD = (
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')",
+    f"""
+    INSERT INTO {FTS_TABLE}(rowid, question_text, answer_text, question_note)
+    SELECT id, {_row('')} FROM api_question
+    """,
+)
+
+SQLITE_INSTALL = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        question_text, answer_text, question_note,
+        content='', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON api_question BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, question_text, answer_text, question_note)
+        VALUES (new.id, {_row('new.')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON api_question BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, question_text, answer_text, question_note)
+        VALUES ('delete', old.id, {_row('old.')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF question_text, answer_text, question_note ON api_question BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, question_text, answer_text, question_note)
+        VALUES ('delete', old.id, {_row('old.')});
+        INSERT INTO {FTS_TABLE}(rowid, question_text, answer_text, question_note)
+        VALUES (new.id, {_row('new.')});
+    END
+    """,
+) + SQLITE_REBUILD
+
+
+def is_installed():
+    global _installed
+    if _installed:
+        return True
+    _installed = _check_installed()
+    return _installed
+
+
+def _check_installed():
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT 1 FROM information_schema.columns WHERE table_name = 'api_question' AND column_name = %s",
+                [SEARCH_COLUMN],
+            )
+            return cursor.fetchone() is not None
+        if connection.vendor == 'sqlite':
+            names = (FTS_TABLE,) + SQLITE_TRIGGERS
+            cursor.execute(
+                f"SELECT count(*) FROM sqlite_master WHERE name IN ({', '.join(['%s'] * len(names))})", names
+            )
+            return cursor.fetchone()[0] == len(names)
+    return False
+
+
+def install():
+    """
+    Создаёт недостающие структуры индекса; для SQLite заодно перезаполняет его,
+    потому что без триггеров он мог отстать от api_question.
+    True — что-то пришлось создать.
+    """
+    global _installed
+    statements = {'postgresql': POSTGRES_INSTALL, 'sqlite': SQLITE_INSTALL}.get(connection.vendor)
+    if not statements:
+        return False
+    if _check_installed():
+        _installed = True
+        return False
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+    _installed = True
+    return True
+
+
+def rebuild():
+    """Перестраивает индекс FTS5 (tsvector в PostgreSQL пересчитывается сам)"""
+    if install():
+        return
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for statement in SQLITE_REBUILD:
+                cursor.execute(statement)
+
+
+def fts_query(text):
+    """Запрос FTS5: все значимые слова (И), каждое — префикс основы слова"""
+    words = [word for word in WORD.findall(text.lower().replace('ё', 'е')) if word not in STOP_WORDS]
+    return ' '.join('"%s"*' % stem(word) for word in words)
+
+
+def search_ids(text, limit=20, offset=0):
+    """id вопросов по убыванию релевантности"""
+    text = (text or '').strip()
+    if not text:
+        return []
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql' and is_installed():
+            cursor.execute(
+                f"""
+                SELECT id FROM api_question, websearch_to_tsquery('russian', %s) query
+                WHERE {SEARCH_COLUMN} @@ query
+                ORDER BY ts_rank_cd({SEARCH_COLUMN}, query) DESC, id
+                LIMIT %s OFFSET %s
+                """,
+                [text, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+        if connection.vendor == 'sqlite' and is_installed():
+            match = fts_query(text)
+            if not match:
+                return []
+            # bm25: вес текста вопроса выше ответа, ответа — выше комментария
+            cursor.execute(
+                f"""
+                SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s
+                ORDER BY bm25({FTS_TABLE}, 10.0, 5.0, 1.0), rowid
+                LIMIT %s OFFSET %s
+                """,
+                [match, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    # без полнотекстового индекса — медленный, но рабочий поиск подстрокой
+    return list(
+        Question.objects.filter(question_text__icontains=text)
+        .order_by('id')
+        .values_list('id', flat=True)[offset:offset + limit]
+    )
+
+
+def search(text, limit=20, offset=0):
+    ids = search_ids(text, limit, offset)
+    questions = Question.objects.select_related('author_q').in_bulk(ids)
+    return [questions[question_id] for question_id in ids if question_id in questions]
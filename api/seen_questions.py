@@ -0,0 +1,79 @@
+import zlib
+
+from django.db import transaction
+
+from .models import AnswerAttempt, SeenQuestions
+
+# Множество просмотренных вопросов игрока хранится битовой картой по id
+# вопроса (бит i — вопрос с id i), сжатой zlib. Проверка «видел ли» —
+# битовая операция в памяти, без NOT IN по таблицам сессий и ответов.
+
+
+class SeenSet:
+    def __init__(self, bits=b''):
+        self.bits = bytearray(bits)
+
+    @classmethod
+    def from_ids(cls, ids):
+        seen = cls()
+        seen.update(ids)
+        return seen
+
+    @classmethod
+    def load(cls, data):
+        return cls(zlib.decompress(data) if data else b'')
+
+    def dump(self):
+        return zlib.compress(bytes(self.bits))
+
+    def __contains__(self, question_id):
+        index = question_id >> 3
+        return index < len(self.bits) and bool(self.bits[index] & (1 << (question_id & 7)))
+
+    def __len__(self):
+        return sum(bin(byte).count('1') for byte in self.bits)
+
+    def __iter__(self):
+        for index, byte in enumerate(self.bits):
+            if byte:
+                for bit in range(8):
+                    if byte & (1 << bit):
+                        yield (index << 3) | bit
+
+    def add(self, question_id):
+        index = question_id >> 3
+        if index >= len(self.bits):
+            self.bits.extend(bytes(index + 1 - len(self.bits)))
+        self.bits[index] |= 1 << (question_id & 7)
+
+    def update(self, ids):
+        for question_id in ids:
+            self.add(question_id)
+
+
+def get_seen(user_id):
+    """Просмотренные вопросы игрока; при первом обращении собираются из журнала ответов"""
+    data = SeenQuestions.objects.filter(user_id=user_id).values_list('bitmap', flat=True).first()
+    if data is not None:
+        return SeenSet.load(data)
+    seen = SeenSet.from_ids(
+        AnswerAttempt.objects.filter(user_id=user_id).values_list('question_id', flat=True).distinct()
+    )
+    SeenQuestions.objects.get_or_create(user_id=user_id, defaults={'bitmap': seen.dump()})
+    return seen
+
+
+def mark_seen(user_id, question_ids):
+    question_ids = [question_id for question_id in question_ids if question_id is not None]
+    if not question_ids:
+        return
+    with transaction.atomic():
+        row = SeenQuestions.objects.select_for_update().filter(user_id=user_id).first()
+        if row is None:
+            seen = get_seen(user_id)
+            row = SeenQuestions.objects.select_for_update().get(user_id=user_id)
+        else:
+            seen = SeenSet.load(row.bitmap)
+        seen.update(question_ids)
+        row.bitmap = seen.dump()
+        row.save(update_fields=['bitmap', 'updated_at'])
@@ -6,6 +6,7 @@ from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.validators import UniqueValidator
 from django.core.validators import FileExtensionValidator
+from .matching import split_accepted_answers
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -23,6 +24,13 @@ class UserSerializer(serializers.ModelSerializer):
         return super().to_internal_value(cleaned_data)
 
 
+class AuthorSerializer(serializers.ModelSerializer):
+    """Краткое представление автора для списков"""
+    class Meta:
+        model = CustomUser
+        fields = ('id', 'username')
+
+
 class TeamSerializer(serializers.ModelSerializer):
     captain_username = serializers.CharField(source='get_captain_username', read_only=True)
     created_at = serializers.DateTimeField(read_only=True)
@@ -74,13 +82,24 @@ class TeamSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
     
     
+class AcceptedAnswersField(serializers.ListField):
+    """Список зачётных ответов; строка вида «А; Б» тоже принимается"""
+    child = serializers.CharField()
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = split_accepted_answers(data)
+        return super().to_internal_value(data)
+
+
 class QuestionSerializer(serializers.ModelSerializer):
-    author_q = UserSerializer(read_only=True)
+    author_q = AuthorSerializer(read_only=True)
     image_attached = serializers.SerializerMethodField()
+    accepted_answers = AcceptedAnswersField(required=False)
     
     class Meta:
         model = Question
-        fields = ('id', 'question_text', 'answer_text', 'question_note', 'image_attached', 'author_q', 'pub_date_q', 'difficulty')
+        fields = ('id', 'question_text', 'answer_text', 'accepted_answers', 'question_note', 'image_attached', 'author_q', 'pub_date_q', 'difficulty')
         #extra_kwargs = {"author_q": {"read_only": True}}
         depth = 1
         
@@ -114,6 +133,23 @@ class PackSerializer(serializers.ModelSerializer):
         extra_kwargs = {"author_p": {"read_only": True}}
         depth = 1
 
+class PackSummarySerializer(serializers.ModelSerializer):
+    """Пакет без вопросов: счётчики приходят из аннотаций (см. Pack.objects.with_summary())"""
+    author_p = AuthorSerializer(read_only=True)
+    questions_count = serializers.IntegerField(read_only=True)
+    difficulty_histogram = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Pack
+        fields = ('id', 'name', 'author_p', 'description', 'pub_date_p',
+                  'questions_count', 'difficulty_histogram')
+
+    def get_difficulty_histogram(self, obj):
+        return {
+            str(level): getattr(obj, f'difficulty_{level}_count', 0)
+            for level, _ in Question.DIFFICULTY_CHOICES
+        }
+
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
@@ -215,16 +251,55 @@ class GameSessionSerializer(serializers.ModelSerializer):
                  'created_at', 'questions_count']
 
     def get_questions_count(self, obj):
-        return obj.questions.count()
+        return obj.get_questions_count()
 
     def get_current_question(self, obj):
-        question = obj.get_current_question()
+        question = self.context.get('current_question') or obj.get_current_question()
         if question:
             return {
                 "id": question.id,
                 "question_text": question.question_text
             }
         return None
+
+
+class GameResultSerializer(serializers.ModelSerializer):
+    """Итог завершённой игры; для старых сессий без сохранённого рейтинга берётся текущий"""
+    pack = serializers.SerializerMethodField()
+    total_questions = serializers.SerializerMethodField()
+    previous_rating = serializers.SerializerMethodField()
+    current_rating = serializers.SerializerMethodField()
+    rating_change = serializers.SerializerMethodField()
+
+    class Meta:
+        model = GameSession
+        fields = ['id', 'pack', 'correct_answers', 'total_questions',
+                  'previous_rating', 'current_rating', 'rating_change',
+                  'outcomes', 'created_at', 'completed_at']
+
+    def get_pack(self, obj):
+        return {"id": obj.pack_id, "name": obj.pack.name}
+
+    def get_total_questions(self, obj):
+        return len(obj.question_ids) or obj.get_questions_count()
+
+    def get_current_rating(self, obj):
+        # сессия без ответов: рейтинг не менялся с начала игры
+        for rating in (obj.rating_after, obj.rating_before):
+            if rating is not None:
+                return rating
+        return self.context.get('current_rating')
+
+    def get_previous_rating(self, obj):
+        if obj.rating_before is not None:
+            return obj.rating_before
+        return self.get_current_rating(obj)
+
+    def get_rating_change(self, obj):
+        current, previous = self.get_current_rating(obj), self.get_previous_rating(obj)
+        if current is None or previous is None:
+            return 0
+        return current - previous
     
 
 class ForumMessageSerializer(serializers.ModelSerializer):
@@ -250,10 +325,18 @@ class ForumMessageSerializer(serializers.ModelSerializer):
         return data
 
     def get_replies(self, obj):
-        replies = obj.replies.all().order_by('created_at')
+        # дерево, собранное ForumThread.get_message_tree, избавляет от запроса на каждое сообщение
+        tree = self.context.get('replies')
+        if tree is not None:
+            replies = tree.get(obj.id, [])
+        else:
+            replies = obj.replies.all().order_by('created_at')
         return ForumMessageSerializer(replies, many=True, context=self.context).data
 
     def get_user_vote(self, obj):
+        votes = self.context.get('user_votes')
+        if votes is not None:
+            return votes.get(obj.id)
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.get_user_vote(request.user)
@@ -277,6 +360,18 @@ class ForumThreadSerializer(serializers.ModelSerializer):
     def get_message_count(self, obj):
         return obj.calculated_message_count if hasattr(obj, 'calculated_message_count') else obj.message_count
     
+class ForumThreadSummarySerializer(serializers.ModelSerializer):
+    """Тема в списке форума: без сообщений, только сохранённые счётчики"""
+    created_by = serializers.StringRelatedField(read_only=True)
+
+    class Meta:
+        model = ForumThread
+        fields = [
+            'id', 'title', 'created_by', 'is_closed',
+            'created_at', 'updated_at', 'last_activity', 'message_count'
+        ]
+        read_only_fields = ['created_at', 'updated_at', 'last_activity', 'message_count']
+
 class MessageVoteSerializer(serializers.ModelSerializer):
     class Meta:
         model = MessageVote
@@ -302,4 +397,13 @@ class UserRatingHistorySerializer(serializers.ModelSerializer):
     
     class Meta:
         model = UserRatingHistory
-        fields = ['rating', 'date']
\ No newline at end of file
+        fields = ['rating', 'date']
+
+class RatingHistoryBucketSerializer(serializers.Serializer):
+    date = serializers.DateTimeField(source='bucket', format="%Y-%m-%dT%H:%M:%S")
+    rating = serializers.IntegerField(source='close')
+    open = serializers.IntegerField()
+    close = serializers.IntegerField()
+    min = serializers.IntegerField()
+    max = serializers.IntegerField()
+    count = serializers.IntegerField()
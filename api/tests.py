@@ -1,3 +1,697 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+from django.db import connection, transaction
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .game_cache import get_game_cache
+from .harvester import Harvester, parse_questions
+from .importer import QuestionImporter, iter_json_array
+from .matching import build_answer_keys, build_question_keys, match_keys
+from .models import AnswerAttempt, CustomUser, GameSession, MessageVote, Pack, Question, UserRatingHistory
+
+
+class QuestionCursorPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(username='author', password='p', email='a@a.ru')
+        start = timezone.now() - timedelta(days=1)
+        # по три вопроса на одну дату: проверяет переход через равные значения первого поля
+        Question.objects.bulk_create(
+            Question(
+                question_text=f'Вопрос {i}', answer_text='Ответ', author_q=cls.author,
+                pub_date_q=start + timedelta(minutes=i // 3),
+            )
+            for i in range(25)
+        )
+        cls.expected = list(Question.objects.order_by('pub_date_q', 'id').values_list('id', flat=True))
+
+    def test_forward_pages_cover_all_rows_in_order(self):
+        client = APIClient()
+        url, seen = '/api/question/list/?page_size=4', []
+        while url:
+            data = client.get(url).json()
+            seen += [row['id'] for row in data['results']]
+            url = data['next']
+        self.assertEqual(seen, self.expected)
+
+    def test_previous_link_returns_preceding_page(self):
+        client = APIClient()
+        first = client.get('/api/question/list/?page_size=4').json()
+        second = client.get(first['next']).json()
+        back = client.get(second['previous']).json()
+        self.assertEqual([row['id'] for row in back['results']], self.expected[:4])
+        self.assertIsNone(first['previous'])
+
+    def test_seek_is_bounded_on_leading_column(self):
+        client = APIClient()
+        first = client.get('/api/question/list/?page_size=4').json()
+        with CaptureQueriesContext(connection) as queries:
+            client.get(first['next'])
+        seek = queries.captured_queries[-1]['sql']
+        self.assertIn('"pub_date_q" >=', seek)
+
+    def test_invalid_cursor_is_404(self):
+        response = APIClient().get('/api/question/list/?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+
+class AnswerMatchingTests(SimpleTestCase):
+
+    def assertAccepted(self, answer, submitted):
+        self.assertTrue(match_keys(submitted, build_answer_keys(answer)), f'{submitted!r} для {answer!r}')
+
+    def assertRejected(self, answer, submitted):
+        self.assertFalse(match_keys(submitted, build_answer_keys(answer)), f'{submitted!r} для {answer!r}')
+
+    def test_normalization(self):
+        self.assertAccepted('«Ёлка»', 'елка')
+        self.assertAccepted('Пётр Первый', 'первый петр')
+        self.assertAccepted('Чайковский [Пётр Ильич]', 'Чайковский')
+
+    def test_typos_in_words(self):
+        self.assertAccepted('Чайковский', 'Чайковскй')
+        self.assertAccepted('Людовик XIV', 'Лудовик XIV')
+        self.assertRejected('Кот', 'Кит')
+
+    def test_numbers_must_match_exactly(self):
+        self.assertRejected('1812 год', '1813 год')
+        self.assertRejected('2000 лет', '3000 лет')
+        self.assertAccepted('1812 год', 'год 1812')
+
+    def test_roman_numerals_must_match_exactly(self):
+        self.assertRejected('Иван III', 'Иван II')
+        self.assertRejected('Людовик XIV', 'Людовик XV')
+
+    def test_stop_word_answer(self):
+        self.assertEqual(build_answer_keys('В'), ('в',))
+        self.assertAccepted('В', 'в')
+        self.assertRejected('В', 'О')
+
+    def test_non_string_answers(self):
+        self.assertAccepted('1812 год', '1812 год')
+        self.assertTrue(match_keys(1812, build_answer_keys('1812')))
+        for submitted in (None, ['1812'], {'answer': '1812'}, True):
+            self.assertFalse(match_keys(submitted, build_answer_keys('1812')), submitted)
+
+
+class QuestionCheckTests(TestCase):
+
+    def test_accepted_variants_are_checked(self):
+        question = Question.objects.create(
+            question_text='Кто?', answer_text='Пушкин', accepted_answers=['Наше всё'],
+        )
+        client = APIClient()
+        for answer, expected in (('пушкин', True), ('наше все', True), ('лермонтов', False)):
+            response = client.post(f'/api/question/{question.id}/check/', {'answer': answer}, format='json')
+            self.assertEqual(response.json()['is_correct'], expected, answer)
+
+    def test_non_string_answer_is_not_an_error(self):
+        question = Question.objects.create(question_text='Когда?', answer_text='1812')
+        client = APIClient()
+        for answer, expected in ((1812, True), (['1812'], False), ({'a': 1}, False)):
+            response = client.post(f'/api/question/{question.id}/check/', {'answer': answer}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['is_correct'], expected, answer)
+
+
+class LeaderboardAroundTests(TestCase):
+
+    def test_neighbours_match_full_ordering(self):
+        from . import leaderboard
+        for i, rating in enumerate((1200, 1100, 1100, 1100, 1000, 1000, 900, 1100, 800)):
+            CustomUser.objects.create_user(username=f'p{i}', password='p', email=f'p{i}@a.ru', elo_rating=rating)
+        leaderboard.rebuild()
+        ordered = list(CustomUser.objects.order_by('-elo_rating', 'id').values_list('id', flat=True))
+        for index, user_id in enumerate(ordered):
+            rows, position = leaderboard.around(CustomUser.objects.get(pk=user_id), 2)
+            self.assertEqual([row['id'] for row in rows], ordered[max(0, index - 2):index + 3])
+        rows, position = leaderboard.around(CustomUser.objects.get(pk=ordered[3]), 2)
+        self.assertEqual(position, 2)
+
+
+
+@override_settings(RATING_HISTORY_MODE='window')
+class RatingHistoryBufferTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='player', password='p', email='p@a.ru')
+
+    def test_rolled_back_rating_is_not_buffered(self):
+        from . import rating_history
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                rating_history.record(self.user.pk, 1234)
+                raise RuntimeError
+        self.assertEqual(callbacks, [])
+
+    def test_closed_windows_are_written_without_new_answers(self):
+        from .rating_history import RatingHistoryBuffer
+        buffer = RatingHistoryBuffer(window=300, batch_size=500)
+        start = timezone.now() - timedelta(hours=1)
+        buffer.add(self.user.pk, 1010, now=start)
+        before = UserRatingHistory.objects.filter(user=self.user).count()
+        buffer.flush_closed()
+        self.assertEqual(UserRatingHistory.objects.filter(user=self.user).count(), before + 1)
+        self.assertEqual(buffer.pending, {})
+
+
+class RatingHistoryOrphanTests(TransactionTestCase):
+    """Foreign key в SQLite проверяется только при настоящем коммите"""
+
+    def test_deleted_user_is_dropped_and_others_are_written(self):
+        from . import rating_history
+        buffer = rating_history.RatingHistoryBuffer(window=300, batch_size=500)
+        gone = CustomUser.objects.create_user(username='gone', password='p', email='g@a.ru')
+        kept = CustomUser.objects.create_user(username='kept', password='p', email='k@a.ru')
+        start = timezone.now() - timedelta(hours=1)
+        buffer.add(gone.pk, 1010, now=start)
+        buffer.add(kept.pk, 1020, now=start)
+        gone_pk = gone.pk
+        gone.delete()
+        with mock.patch.object(rating_history, 'buffer', buffer):
+            rating_history.flush()
+            rating_history.flush()
+        self.assertFalse(UserRatingHistory.objects.filter(user_id=gone_pk).exists())
+        self.assertEqual(UserRatingHistory.objects.filter(user=kept, rating=1020).count(), 1)
+        self.assertEqual(buffer.closed, [])
+
+    def test_flush_errors_do_not_reach_the_caller(self):
+        from . import rating_history
+        buffer = rating_history.RatingHistoryBuffer(window=300, batch_size=1, max_rows=2)
+        user = CustomUser.objects.create_user(username='player', password='p', email='p@a.ru')
+        start = timezone.now() - timedelta(hours=1)
+        with mock.patch.object(rating_history, 'buffer', buffer), \
+                mock.patch.object(rating_history, 'bulk_write', side_effect=RuntimeError), \
+                self.assertLogs('api.rating_history', level='ERROR'):
+            for minutes in range(0, 30, 6):
+                rating_history.add(user.pk, 1000 + minutes, now=start + timedelta(minutes=minutes))
+            rating_history.flush()
+        self.assertLessEqual(len(buffer.closed), 2)
+
+
+class ReplayRatingsGuardTests(TestCase):
+
+    def test_refuses_to_reset_rating_earned_before_the_log(self):
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        CustomUser.objects.create_user(username='veteran', password='p', email='v@a.ru', elo_rating=1300)
+        with self.assertRaises(CommandError):
+            call_command('replay_ratings')
+        self.assertEqual(CustomUser.objects.get(username='veteran').elo_rating, 1300)
+
+
+
+class AttemptLogSettleTests(TestCase):
+
+    def test_calibration_waits_for_buffered_attempts(self):
+        from .calibration import calibrate
+        user = CustomUser.objects.create_user(username='player', password='p', email='p@a.ru')
+        question = Question.objects.create(question_text='Кто?', answer_text='Пушкин')
+        pack = Pack.objects.create(name='Пак', author_p=user)
+        session = GameSession.objects.create(user=user, pack=pack, is_completed=True, completed_at=timezone.now())
+        AnswerAttempt.objects.create(session=session, user=user, question=question, is_correct=True)
+
+        self.assertEqual(calibrate(), (0, 0))
+        GameSession.objects.filter(pk=session.pk).update(completed_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(calibrate(), (1, 1))
+
+    def test_periodic_flusher_calls_without_new_writes(self):
+        import threading
+        from .flusher import PeriodicFlusher
+        called = threading.Event()
+        flusher = PeriodicFlusher('test-flush', 0.01, called.set)
+        flusher.ensure_started()
+        try:
+            self.assertTrue(called.wait(2))
+        finally:
+            flusher.stop()
+
+
+class SubmitAnswerTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='player', password='p', email='p@a.ru')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.pack = Pack.objects.create(name='Пак', author_p=self.user)
+        self.questions = [
+            Question.objects.create(question_text=f'Вопрос {i}', answer_text=f'Ответ {i}', difficulty=3)
+            for i in range(3)
+        ]
+        self.pack.questions.set(self.questions)
+        get_game_cache().clear()
+        self.client.get(f'/api/game/{self.pack.id}/start/')
+
+    def submit(self, question, answer):
+        return self.client.post(
+            f'/api/game/{self.pack.id}/questions/{question.id}/submit/', {'answer': answer}, format='json'
+        )
+
+    def test_second_submit_for_current_question_is_rejected(self):
+        first = self.questions_in_order()[0]
+        self.assertEqual(self.submit(first, 'что-то').status_code, 200)
+        rating = CustomUser.objects.get(pk=self.user.pk).elo_rating
+
+        for _ in range(3):
+            self.assertEqual(self.submit(first, 'что-то').status_code, 400)
+
+        session = GameSession.objects.get(user=self.user, pack=self.pack)
+        self.assertEqual(len(session.outcomes), 1)
+        self.assertEqual(CustomUser.objects.get(pk=self.user.pk).elo_rating, rating)
+
+    def test_each_question_is_recorded_once(self):
+        for question in self.questions_in_order():
+            self.submit(question, question.answer_text)
+            self.submit(question, question.answer_text)
+            self.client.get(f'/api/game/{self.pack.id}/questions/{question.id}/next/')
+        session = GameSession.objects.get(user=self.user, pack=self.pack)
+        self.assertEqual(len(session.outcomes), 3)
+        self.assertEqual(session.correct_answers, 3)
+
+    def questions_in_order(self):
+        session = GameSession.objects.get(user=self.user, pack=self.pack)
+        by_id = {question.id: question for question in self.questions}
+        return [by_id[question_id] for question_id in session.get_question_ids()]
+
+
+class GameGeneratorTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='player', password='p', email='p@a.ru')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(10):
+            Question.objects.create(question_text=f'Вопрос {i}', answer_text='Ответ', difficulty=i % 5 + 1)
+        # пулы вопросов кешируются между тестами
+        get_game_cache().clear()
+
+    def test_difficulty_out_of_range_is_400(self):
+        for difficulty in (0, 9, -3):
+            response = self.client.post('/api/game/generate/', {'difficulty': difficulty, 'count': 3}, format='json')
+            self.assertEqual(response.status_code, 400, difficulty)
+
+    def test_curves_stay_within_levels(self):
+        from .pack_generator import LEVELS, difficulty_curve
+        self.assertEqual(difficulty_curve('flat', 2, 9), [LEVELS[-1]] * 2)
+        self.assertEqual(difficulty_curve('ramp', 1, -1), [LEVELS[0]])
+        self.assertEqual(difficulty_curve([0, 3, 7], 3), [LEVELS[0], 3, LEVELS[-1]])
+
+    def test_generated_game_has_requested_count(self):
+        response = self.client.post('/api/game/generate/', {'count': 4, 'curve': 'ramp'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        session = GameSession.objects.get(pk=response.json()['session']['id'])
+        self.assertEqual(len(set(session.get_question_ids())), 4)
+
+
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), 'test_data')
+
+
+def read_test_page(name):
+    with open(os.path.join(TEST_DATA, name), encoding='utf-8') as f:
+        return f.read()
+
+
+class HarvesterParserTests(SimpleTestCase):
+    """Разбор сохранённой страницы db.chgk.info/random (test_data/chgk_random.html)"""
+
+    def setUp(self):
+        self.questions = parse_questions(read_test_page('chgk_random.html'), 'https://db.chgk.info/random')
+
+    def test_blocks_without_answer_are_skipped(self):
+        self.assertEqual(len(self.questions), 3)
+
+    def test_fields(self):
+        first = self.questions[0]
+        self.assertEqual(
+            first['question_text'],
+            'Этот поэт написал «Евгения Онегина» и погиб на дуэли в 1837 году. Назовите его.'
+        )
+        self.assertEqual(first['answer_text'], 'Пушкин')
+        self.assertEqual(first['accepted_answers'], ['Александр Сергеевич', 'А. С. Пушкин'])
+        self.assertEqual(first['question_note'], '«Наше всё».')
+        self.assertIsNone(first['image_url'])
+
+    def test_image_and_comma_separated_variants(self):
+        second = self.questions[1]
+        self.assertEqual(second['question_text'], 'Раздаточный материал:\nЧто изображено на картинке?')
+        self.assertEqual(second['image_url'], 'https://db.chgk.info/images/db/20240101.jpg')
+        # удалённый адрес не должен стать именем файла ImageField при импорте
+        self.assertNotIn('image', second)
+        self.assertEqual(second['accepted_answers'], ['башня Эйфеля', 'Эйфелева'])
+
+    def test_labels_after_answer_are_not_accepted(self):
+        third = self.questions[2]
+        self.assertEqual(third['answer_text'], '4')
+        self.assertEqual(third['accepted_answers'], [])
+
+
+class HarvesterResumeTests(SimpleTestCase):
+
+    def test_resume_skips_done_pages_and_known_questions(self):
+        page = read_test_page('chgk_random.html')
+        fetched = []
+
+        def fetcher(url):
+            fetched.append(url)
+            return page
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'harvested.jsonl')
+            url = 'https://db.chgk.info/random/{page}'
+            self.assertEqual(Harvester(output, url=url, workers=2, fetcher=fetcher).run(2), 3)
+            self.assertEqual(Harvester(output, url=url, workers=2, fetcher=fetcher).run(3), 0)
+            with open(output, encoding='utf-8') as f:
+                rows = [json.loads(line) for line in f]
+        self.assertEqual(len(fetched), 3)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['model'], 'api.question')
+
+
+class QuestionImporterTests(TestCase):
+    TEXT = (
+        'Этот русский поэт написал роман в стихах «Евгений Онегин», '
+        'а в 1837 году был смертельно ранен на дуэли с Дантесом. Назовите его.'
+    )
+
+    def record(self, text=None, **fields):
+        return {'question_text': text or self.TEXT, 'answer_text': 'Пушкин', **fields}
+
+    def test_array_items_split_across_chunks(self):
+        items = [{'model': 'api.question', 'fields': {'question_text': 'Вопрос [1], {скобки}', 'n': n}} for n in range(5)]
+        text = json.dumps(items, ensure_ascii=False, indent=1)
+        for chunk_size in (1, 3, 7, 64):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(list(iter_json_array(io.StringIO(text), chunk_size=chunk_size)), items)
+
+    def test_truncated_array_is_an_error(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('[{"a": 1}, {"b"'), chunk_size=4))
+
+    def test_duplicates_within_batch_and_against_existing_rows(self):
+        importer = QuestionImporter()
+        importer.feed([self.record(), self.record(self.TEXT.replace('Назовите его.', 'Назовите его!'))])
+        importer.flush()
+        self.assertEqual((importer.created, importer.duplicates), (1, 1))
+
+        again = QuestionImporter()
+        again.feed([self.record()])
+        again.flush()
+        self.assertEqual((again.created, again.duplicates), (0, 1))
+        self.assertEqual(Question.objects.count(), 1)
+
+    def test_pack_gets_new_questions_and_existing_duplicates(self):
+        first = QuestionImporter()
+        first.feed([self.record()])
+        first.flush()
+        existing = Question.objects.get()
+
+        pack = Pack.objects.create(name='Импорт')
+        importer = QuestionImporter(pack=pack)
+        importer.feed([self.record(), self.record('Сколько будет дважды два? Ответ нужен числом, без пояснений.')])
+        importer.flush()
+        new = Question.objects.exclude(pk=existing.pk).get()
+        self.assertEqual(
+            set(Pack.questions.through.objects.filter(pack=pack).values_list('question_id', flat=True)),
+            {existing.pk, new.pk},
+        )
+
+    def test_answer_key_is_filled_without_save(self):
+        importer = QuestionImporter()
+        importer.feed([self.record(accepted_answers='Александр Сергеевич; А. С. Пушкин')])
+        importer.flush()
+        question = Question.objects.get()
+        self.assertTrue(question.answer_key)
+        self.assertEqual(question.answer_key, '\n'.join(build_question_keys('Пушкин', question.accepted_answers)))
+
+    def test_images_missing_from_storage_are_dropped(self):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            os.makedirs(os.path.join(media_root, 'media', 'questions'))
+            with open(os.path.join(media_root, 'media', 'questions', 'tower.jpg'), 'wb') as f:
+                f.write(b'jpg')
+            importer = QuestionImporter(dedupe=False)
+            importer.feed([
+                self.record('Вопрос с картинкой из хранилища', image='media/questions/tower.jpg'),
+                self.record('Вопрос с удалённой картинкой', image='https://db.chgk.info/images/db/20240101.jpg'),
+                self.record('Вопрос с путём за пределами хранилища', image='../../etc/passwd'),
+            ])
+            importer.flush()
+        images = dict(Question.objects.values_list('question_text', 'image'))
+        self.assertEqual(images['Вопрос с картинкой из хранилища'], 'media/questions/tower.jpg')
+        self.assertFalse(images['Вопрос с удалённой картинкой'])
+        self.assertFalse(images['Вопрос с путём за пределами хранилища'])
+        self.assertEqual((importer.created, len(importer.warnings)), (3, 2))
+
+
+class SearchIndexTests(TestCase):
+
+    def test_dropped_trigger_is_recreated_and_index_refilled(self):
+        from django.core.management import call_command
+        from . import search
+        if connection.vendor != 'sqlite':
+            self.skipTest('триггеры FTS5 есть только в SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER {search.FTS_TABLE}_ai')
+        Question.objects.create(question_text='Какой зверь живёт в берлоге?', answer_text='Медведь')
+        self.assertFalse(search._check_installed())
+
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertTrue(search._check_installed())
+        self.assertEqual(len(search.search_ids('берлога')), 1)
+        Question.objects.create(question_text='Кто ещё зимует в берлоге?', answer_text='Медведица')
+        self.assertEqual(len(search.search_ids('берлога')), 2)
+
+
+class ThreadIndexTests(TestCase):
+
+    def test_threads_ordered_by_last_activity_across_pages(self):
+        from .models import ForumMessage, ForumThread
+        user = CustomUser.objects.create_user(username='writer', password='p', email='w@a.ru')
+        threads = [ForumThread.objects.create(title=f'Тема {i}', created_by=user) for i in range(5)]
+        ForumMessage.objects.create(thread=threads[1], author=user, content='поднять тему')
+
+        client = APIClient()
+        first = client.get('/api/threads/?page_size=2').json()
+        with CaptureQueriesContext(connection) as queries:
+            second = client.get(first['next']).json()
+        seek = queries.captured_queries[-1]['sql']
+        third = client.get(second['next']).json()
+
+        ids = [row['id'] for page in (first, second, third) for row in page['results']]
+        self.assertEqual(ids[0], threads[1].id)
+        self.assertEqual(sorted(ids), sorted(thread.id for thread in threads))
+        self.assertEqual(first['results'][0]['message_count'], 1)
+        self.assertIn('"last_activity" <=', seek)
+        self.assertIsNone(third['next'])
+
+
+class ForumVoteTests(TestCase):
+
+    def setUp(self):
+        from .models import ForumMessage, ForumThread
+        self.author = CustomUser.objects.create_user(username='author', password='p', email='a@a.ru')
+        self.voter = CustomUser.objects.create_user(username='voter', password='p', email='v@a.ru')
+        self.thread = ForumThread.objects.create(title='Тема', created_by=self.author)
+        self.message = ForumMessage.objects.create(thread=self.thread, author=self.author, content='Сообщение')
+        self.client = APIClient()
+        self.client.force_authenticate(self.voter)
+
+    def vote(self, value):
+        return self.client.post(f'/api/messages/{self.message.id}/vote/', {'vote': value}, format='json')
+
+    def counts(self):
+        self.message.refresh_from_db()
+        return self.message.upvotes_count, self.message.downvotes_count
+
+    def test_new_vote(self):
+        response = self.vote(1)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['upvotes_count'], response.data['downvotes_count']), (1, 0))
+        self.assertEqual(self.counts(), (1, 0))
+
+    def test_switching_and_repeating_a_vote(self):
+        self.vote(1)
+        response = self.vote(-1)
+        self.assertEqual(response.data['current_rating'], -1)
+        self.assertEqual(self.counts(), (0, 1))
+        self.vote(-1)
+        self.assertEqual(self.counts(), (0, 1))
+        self.assertEqual(MessageVote.objects.filter(message=self.message).count(), 1)
+
+    def test_deleting_a_vote(self):
+        self.vote(1)
+        MessageVote.objects.get(user=self.voter, message=self.message).delete()
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_reconcile_fixes_drift_after_queryset_delete(self):
+        from django.core.management import call_command
+        self.vote(-1)
+        # QuerySet.delete() не вызывает MessageVote.delete, счётчики расходятся с голосами
+        MessageVote.objects.filter(message=self.message).delete()
+        self.assertEqual(self.counts(), (0, 1))
+        out = io.StringIO()
+        call_command('reconcile_forum', stdout=out)
+        self.assertEqual(self.counts(), (0, 0))
+        self.assertIn('Messages fixed: 1', out.getvalue())
+
+    def test_thread_tree_in_three_queries(self):
+        from .models import ForumMessage
+        reply = ForumMessage.objects.create(
+            thread=self.thread, author=self.voter, content='Ответ', parent_message=self.message
+        )
+        nested = ForumMessage.objects.create(
+            thread=self.thread, author=self.author, content='Ответ на ответ', parent_message=reply
+        )
+        ForumMessage.objects.create(thread=self.thread, author=self.author, content='Второе сообщение')
+        self.vote(1)
+        MessageVote.objects.create(user=self.voter, message=nested, vote=-1)
+
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/threads/{self.thread.id}/messages/')
+        roots = response.json()
+        self.assertEqual([root['content'] for root in roots], ['Сообщение', 'Второе сообщение'])
+        self.assertEqual(roots[0]['user_vote'], 1)
+        self.assertEqual(roots[0]['replies'][0]['replies'][0]['id'], nested.id)
+        self.assertEqual(roots[0]['replies'][0]['replies'][0]['user_vote'], -1)
+
+
+@override_settings(RATING_HISTORY_MODE='session')
+class NextQuestionTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='player', password='p', email='p@a.ru')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.pack = Pack.objects.create(name='Пак', author_p=self.user)
+        self.pack.questions.set([
+            Question.objects.create(question_text=f'Вопрос {i}', answer_text=f'Ответ {i}') for i in range(2)
+        ])
+        get_game_cache().clear()
+        self.client.get(f'/api/game/{self.pack.id}/start/')
+        self.session = GameSession.objects.get(user=self.user, pack=self.pack)
+
+    def next(self, question_id):
+        return self.client.get(f'/api/game/{self.pack.id}/questions/{question_id}/next/')
+
+    def test_stale_cached_session_does_not_complete_twice(self):
+        from .game_cache import cache_session
+        first, last = self.session.get_question_ids()
+        self.next(first)
+        # кэш другого процесса: сессия ещё на последнем вопросе
+        stale = GameSession.objects.get(pk=self.session.pk)
+        self.assertEqual(self.next(last).json()['message'], 'Game completed')
+        completed_at = GameSession.objects.get(pk=self.session.pk).completed_at
+        history = UserRatingHistory.objects.filter(user=self.user).count()
+
+        cache_session(stale)
+        response = self.next(last)
+        self.assertIn(response.status_code, (200, 404))
+        self.assertEqual(GameSession.objects.get(pk=self.session.pk).completed_at, completed_at)
+        self.assertEqual(UserRatingHistory.objects.filter(user=self.user).count(), history)
+
+    def test_stale_advance_rereads_current_question(self):
+        first, last = self.session.get_question_ids()
+        stale = GameSession.objects.get(pk=self.session.pk)
+        self.next(first)
+        self.assertEqual(stale.move_to_next_question().id, last)
+        self.assertEqual(stale.current_question_index, 1)
+        self.assertEqual(GameSession.objects.get(pk=self.session.pk).current_question_index, 1)
+
+
+class RatingHistoryBucketTests(TestCase):
+
+    def test_open_and_close_follow_dates_not_insertion_order(self):
+        user = CustomUser.objects.create_user(username='player', password='p', email='p@a.ru')
+        day = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0) - timedelta(days=2)
+        UserRatingHistory.objects.filter(user=user).delete()
+        # буфер другого процесса записал утреннее окно позже вечернего
+        for hours, rating in ((8, 1040), (-6, 1010), (3, 990), (-2, 1020)):
+            UserRatingHistory.objects.create(user=user, rating=rating, date=day + timedelta(hours=hours))
+
+        (candle,) = UserRatingHistory.objects.filter(user=user).bucketed('day')
+        self.assertEqual(candle['open'], 1010)
+        self.assertEqual(candle['close'], 1040)
+        self.assertEqual((candle['min'], candle['max'], candle['count']), (990, 1040, 4))
+
+
+
+class AttemptLogOrphanTests(TransactionTestCase):
+    """Внешние ключи SQLite проверяются при коммите, поэтому нужны настоящие транзакции"""
+
+    def setUp(self):
+        from . import attempt_log, rating_history
+        # on_commit здесь выполняется по-настоящему: буферы процесса подменяются,
+        # чтобы их строки не попали в базу разработки при выходе
+        for module, replacement in (
+            (attempt_log, attempt_log.AttemptBuffer(batch_size=200, flush_interval=3600)),
+            (rating_history, rating_history.RatingHistoryBuffer(window=300, batch_size=500)),
+        ):
+            patcher = mock.patch.object(module, 'buffer', replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        get_game_cache().clear()
+        self.pack = Pack.objects.create(name='Пак')
+        self.question = Question.objects.create(question_text='Кто?', answer_text='Пушкин')
+        self.pack.questions.set([self.question, Question.objects.create(question_text='Где?', answer_text='Там')])
+
+    def player(self, name):
+        user = CustomUser.objects.create_user(username=name, password='p', email=f'{name}@a.ru')
+        client = APIClient()
+        client.force_authenticate(user)
+        client.get(f'/api/game/{self.pack.id}/start/')
+        session = GameSession.objects.get(user=user, pack=self.pack)
+        return user, client, session
+
+    def submit(self, client, session):
+        question_id = session.get_current_question_id()
+        return client.post(
+            f'/api/game/{self.pack.id}/questions/{question_id}/submit/', {'answer': 'Пушкин'}, format='json'
+        )
+
+    def test_deleted_player_does_not_block_the_buffer(self):
+        from . import attempt_log
+        buffer = attempt_log.AttemptBuffer(batch_size=2, flush_interval=3600)
+        with mock.patch.object(attempt_log, 'buffer', buffer):
+            first, first_client, first_session = self.player('first')
+            second, second_client, second_session = self.player('second')
+            self.assertEqual(self.submit(first_client, first_session).status_code, 200)
+            first.delete()
+
+            response = self.submit(second_client, second_session)
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(AnswerAttempt.objects.values_list('user_id', flat=True)), [second.pk])
+        self.assertEqual(buffer.rows, [])
+
+    def test_deleted_session_rows_are_dropped_on_flush(self):
+        from .attempt_log import AttemptBuffer
+        user, _, session = self.player('player')
+        buffer = AttemptBuffer(batch_size=100, flush_interval=3600)
+        buffer.add(AnswerAttempt(session_id=session.pk, user_id=user.pk, question=self.question, is_correct=True))
+        other = GameSession.objects.create(user=user, pack=self.pack)
+        buffer.add(AnswerAttempt(session_id=other.pk, user_id=user.pk, question=self.question, is_correct=False))
+        session.delete()
+
+        buffer.flush()
+        self.assertEqual(list(AnswerAttempt.objects.values_list('session_id', flat=True)), [other.pk])
+        self.assertEqual(buffer.rows, [])
+
+    def test_buffer_is_capped_while_the_database_fails(self):
+        from .attempt_log import AttemptBuffer
+        user, _, session = self.player('player')
+        buffer = AttemptBuffer(batch_size=1, flush_interval=3600, max_rows=3)
+        with mock.patch('api.flusher.bulk_write', side_effect=RuntimeError), \
+                mock.patch('api.attempt_log.bulk_write', side_effect=RuntimeError):
+            for _ in range(5):
+                with self.assertRaises(RuntimeError):
+                    buffer.add(AnswerAttempt(session_id=session.pk, user_id=user.pk, question=self.question))
+        self.assertEqual(len(buffer.rows), 3)
@@ -0,0 +1,72 @@
+import datetime
+
+from django.utils import timezone
+
+from .models import ReviewItem
+
+# Тренировка по схеме SM-2: вопрос, на который игрок ответил неверно,
+# попадает в его очередь повторения; после каждого повторения интервал
+# растёт (1 день, 6 дней, затем умножается на коэффициент лёгкости),
+# а ошибка возвращает вопрос к началу.
+MIN_EASE = 1.3
+CORRECT_QUALITY, WRONG_QUALITY = 4, 1
+
+
+def sm2(repetitions, interval_days, ease_factor, quality):
+    """Новые (repetitions, interval_days, ease_factor) после ответа с оценкой quality от 0 до 5"""
+    if quality >= 3:
+        if repetitions == 0:
+            interval_days = 1
+        elif repetitions == 1:
+            interval_days = 6
+        else:
+            interval_days = round(interval_days * ease_factor)
+        repetitions += 1
+    else:
+        repetitions = 0
+        interval_days = 1
+    ease_factor = max(MIN_EASE, ease_factor + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return repetitions, interval_days, ease_factor
+
+
+def enqueue(user_id, question_id, now=None):
+    """Ставит вопрос в очередь повторения сразу к показу (после ошибки в игре)"""
+    now = now or timezone.now()
+    updated = ReviewItem.objects.filter(user_id=user_id, question_id=question_id).update(
+        due_at=now, repetitions=0, interval_days=0
+    )
+    if not updated:
+        ReviewItem.objects.get_or_create(user_id=user_id, question_id=question_id, defaults={'due_at': now})
+
+
+def next_item(user):
+    """Ближайший по сроку вопрос игрока — одно чтение по индексу (user, due_at)"""
+    return (
+        ReviewItem.objects.filter(user=user)
+        .select_related('question')
+        .only('id', 'user_id', 'due_at', 'repetitions', 'interval_days', 'question__id', 'question__question_text')
+        .order_by('due_at')
+        .first()
+    )
+
+
+def review(item, is_correct, now=None):
+    """Пересчитывает расписание; вызывается в транзакции ответа с заблокированной строкой"""
+    now = now or timezone.now()
+    quality = CORRECT_QUALITY if is_correct else WRONG_QUALITY
+    item.repetitions, item.interval_days, item.ease_factor = sm2(
+        item.repetitions, item.interval_days, item.ease_factor, quality
+    )
+    if not is_correct:
+        item.lapses += 1
+    item.last_reviewed_at = now
+    item.due_at = now + datetime.timedelta(days=item.interval_days)
+    item.save(update_fields=[
+        'repetitions', 'interval_days', 'ease_factor', 'lapses', 'last_reviewed_at', 'due_at'
+    ])
+    return item
+
+
+def lock_item(user, question_id):
+    """Строка расписания под блокировкой; вызывать внутри transaction.atomic"""
+    return ReviewItem.objects.select_for_update().get(user=user, question_id=question_id)
@@ -4,7 +4,9 @@ from . import views
 urlpatterns = [
    
     path('question/list/', views.QuestionViewList.as_view(), name="question-list"),
+    path('question/search/', views.QuestionSearchView.as_view(), name="question-search"),
     path('question/<int:pk>/', views.QuestionView.as_view(), name="view-question"),
+    path('question/<int:pk>/check/', views.QuestionCheckView.as_view(), name="check-question"),
     path('question/create/', views.QuestionCreate.as_view(), name="create-question"),
     path('question/delete/<int:pk>/', views.QuestionDelete.as_view(), name="delete-question"),
     path('question/update/<int:pk>/', views.QuestionUpdate.as_view(), name="update-question"),
@@ -36,6 +38,9 @@ urlpatterns = [
     path('user/<int:pk>/invitations/', views.InvitationViewList.as_view(), name='invitation-list'),
     path('user/<int:pk>/invitations/<int:invitation_id>/respond/', views.InvitationResponseView.as_view(), name='invitation-respond'),
     path('user/rating-history/', views.UserRatingHistoryView.as_view(), name='rating-history'),
+    path('user/<int:pk>/rating-history/', views.UserRatingHistoryDetailView.as_view(), name='user-rating-history'),
+    path('rating/leaderboard/', views.LeaderboardView.as_view(), name='leaderboard'),
+    path('rating/leaderboard/me/', views.LeaderboardAroundView.as_view(), name='leaderboard-me'),
     
     path('game/<int:pack_id>/start/', views.GameStartView.as_view(), name='start-game'),
     path('game/<int:pack_id>/questions/', views.PackQuestionViewList.as_view(), name='pack-questions'),
@@ -44,6 +49,10 @@ urlpatterns = [
     path('game/<int:pack_id>/questions/<int:question_id>/next/', views.NextQuestionView.as_view(), name='next-question'),
     path('game/<int:pack_id>/questions/<int:question_id>/submit/', views.SubmitAnswerView.as_view(), name='submit-answer'),
     path('game/<int:pack_id>/results/', views.GameResultsView.as_view(), name='game-results'),
+    path('game/history/', views.GameHistoryView.as_view(), name='game-history'),
+    path('game/generate/', views.GameGenerateView.as_view(), name='game-generate'),
+    path('training/next/', views.TrainingNextView.as_view(), name='training-next'),
+    path('training/<int:question_id>/submit/', views.TrainingSubmitView.as_view(), name='training-submit'),
 
     path('threads/', views.ThreadViewList.as_view(), name='thread-list'),
     path('threads/<int:pk>/messages/', views.ThreadMessagesViewList.as_view(), name='thread-detail'),
@@ -6,14 +6,14 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.views import exception_handler
 
-import random
 import os
+import datetime
 import mimetypes
 from PIL import Image
 from io import BytesIO
 
 from django.db import transaction
-from django.db.models import Sum, Count, Max
+from django.db.models import Prefetch
 
 from django.http import FileResponse
 from django.core.exceptions import ValidationError
@@ -21,21 +21,28 @@ from django.shortcuts import get_object_or_404, render
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth import authenticate
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
 from .serializers import ( 
-    QuestionSerializer, PackSerializer, 
+    QuestionSerializer, PackSerializer, PackSummarySerializer,
     UserSerializer, TeamSerializer, 
     MyTokenObtainPairSerializer, 
     RegisterSerializer, LoginSerializer,
-    GameSessionSerializer,
-    ForumThreadSerializer, ForumMessageSerializer, 
+    GameSessionSerializer, GameResultSerializer,
+    ForumThreadSerializer, ForumThreadSummarySerializer, ForumMessageSerializer, 
     MessageVoteSerializer,
     InvitationSerializer,
-    UserRatingHistorySerializer
+    UserRatingHistorySerializer, RatingHistoryBucketSerializer
 )
 
+from .pagination import QuestionCursorPagination, GameHistoryPagination, ThreadPagination
+from .matching import check_answer
+from .game_cache import get_active_session, cache_session
+from .seen_questions import get_seen
+from . import leaderboard, elo, attempt_log, pack_pool, pack_generator, training, search, duplicates
+
 from django.contrib.auth.models import AbstractUser
-from .models import Question, Pack, Team, CustomUser, GameSession, ForumThread, ForumMessage, MessageVote, Invitation, UserRatingHistory
+from .models import Question, Pack, Team, CustomUser, GameSession, ForumThread, ForumMessage, MessageVote, Invitation, UserRatingHistory, ReviewItem
 
 import uuid
 
@@ -45,18 +52,39 @@ class QuestionViewList(generics.ListCreateAPIView):
     
     serializer_class = QuestionSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = QuestionCursorPagination
     
     def get_queryset(self):
-      queryset = Question.objects.all()
+      queryset = Question.objects.select_related('author_q')
       return queryset
 
+class QuestionSearchView(APIView):
+    """Полнотекстовый поиск по вопросам: ?q=...&limit=20&offset=0, по убыванию релевантности"""
+    permission_classes = [permissions.AllowAny]
+    max_limit = 50
+
+    def get(self, request):
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), self.max_limit))
+            offset = max(0, int(request.query_params.get('offset', 0)))
+        except ValueError:
+            return Response({"error": "Invalid limit or offset"}, status=status.HTTP_400_BAD_REQUEST)
+
+        questions = search.search(request.query_params.get('q', ''), limit, offset)
+        return Response({
+            "results": QuestionSerializer(questions, many=True).data,
+            "offset": offset,
+            "limit": limit
+        })
+
 class QuestionViewListAuthor(generics.ListCreateAPIView):
     
     serializer_class = QuestionSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = QuestionCursorPagination
     
     def get_queryset(self):
-      queryset = Question.objects.all()
+      queryset = Question.objects.select_related('author_q')
       author_id = self.kwargs.get('pk')
       if author_id:
         queryset = queryset.filter(author_q__id=author_id)
@@ -97,6 +125,15 @@ class QuestionView(generics.RetrieveAPIView):
                 {'error': str(e)},
                 status=500
             )
+
+
+class QuestionCheckView(APIView):
+    """Проверка ответа вне игры (тренировка на странице вопроса): учитывает зачётные варианты и опечатки"""
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request, pk):
+        question = get_object_or_404(Question.objects.only('id', 'answer_text', 'accepted_answers', 'answer_key'), pk=pk)
+        return Response({"is_correct": check_answer(question, request.data.get("answer"))})
    
     
 class QuestionCreate(generics.ListCreateAPIView):
@@ -113,6 +150,14 @@ class QuestionCreate(generics.ListCreateAPIView):
         if response.status_code == 201 and not response.data.get('author_q'):
             question = Question.objects.get(id=response.data['id'])
             response.data['author_q'] = question.author_q.username if question.author_q else None
+        if response.status_code == 201:
+            # вопрос сохраняется, но автор видит похожие, уже существующие в базе
+            response.data['possible_duplicates'] = [
+                {"id": question_id, "similarity": round(score, 2)}
+                for question_id, score in duplicates.find_similar(
+                    request.data.get('question_text'), exclude_id=response.data['id']
+                )
+            ]
         return response
     
 class QuestionDelete(generics.DestroyAPIView):
@@ -226,20 +271,43 @@ class PackView(generics.RetrieveAPIView):
     permission_classes = [permissions.AllowAny]
     queryset = Pack.objects.all()
 
-class PackViewList(generics.ListCreateAPIView):
+class PackSummaryMixin:
+    """
+    Списки пакетов отдают краткое представление; полные вопросы
+    возвращаются только при ?expand=questions.
+    """
+
+    def expand_questions(self):
+        return self.request.query_params.get('expand') == 'questions'
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET' and not self.expand_questions():
+            return PackSummarySerializer
+        return PackSerializer
+
+    def get_pack_queryset(self):
+        if self.expand_questions():
+            queryset = Pack.objects.select_related('author_p').prefetch_related(
+                Prefetch('questions', queryset=Question.objects.select_related('author_q'))
+            )
+        else:
+            queryset = Pack.objects.with_summary()
+        return queryset.filter(is_generated=False)
+
+class PackViewList(PackSummaryMixin, generics.ListCreateAPIView):
     serializer_class = PackSerializer
     permission_classes = [permissions.AllowAny]
     
     def get_queryset(self):
-      queryset = Pack.objects.all()
+      queryset = self.get_pack_queryset()
       return queryset
     
-class PackViewListAuthor(generics.ListCreateAPIView):
+class PackViewListAuthor(PackSummaryMixin, generics.ListCreateAPIView):
     serializer_class = PackSerializer
     permission_classes = [permissions.AllowAny]
     
     def get_queryset(self):
-      queryset = Pack.objects.all()
+      queryset = self.get_pack_queryset()
       author_id = self.kwargs.get('pk')
       if author_id:
         queryset = queryset.filter(author_p__id=author_id)
@@ -682,39 +750,47 @@ class GameStartView(APIView):
     def get(self, request, pack_id):
         try:
             if (pack_id == 0):
-                while (True):
-                  pack_id = random.randint(1, Pack.objects.count() + 1)
-                  pack = Pack.objects.get(id=pack_id)
-                  questions = pack.questions.all().order_by('id')
-                  if questions.count() != 0:
-                      break
+                pack_id = pack_pool.pick_random_pack_id(
+                    request.user,
+                    min_difficulty=self._parse_difficulty(request.query_params.get('min_difficulty')),
+                    max_difficulty=self._parse_difficulty(request.query_params.get('max_difficulty')),
+                )
+                if pack_id is None:
+                    return Response({"error": "No playable packs found"}, status=404)
             print(f"Starting game for pack {pack_id}, user {request.user.id}")  # Логирование
             pack = Pack.objects.get(id=pack_id)
-            questions = pack.questions.all().order_by('id')
+            question_ids = list(pack.questions.order_by('id').values_list('id', flat=True))
             print(pack_id)
-            if not questions.exists():
+            if not question_ids:
                 print("Pack has no questions")  # Логирование
                 return Response({"error": "This pack has no questions"}, status=400)
+            if request.query_params.get('skip_seen') in ('1', 'true'):
+                # уже просмотренные вопросы пропускаются, пока в паке остаются новые
+                seen = get_seen(request.user.pk)
+                question_ids = [question_id for question_id in question_ids if question_id not in seen] or question_ids
             
             session = GameSession.objects.create(
                 user=request.user,
                 pack=pack,
                 correct_answers=0,
-                current_question_index=0
+                current_question_index=0,
+                rating_before=request.user.elo_rating
             )
-            session.questions.set(questions)
+            session.set_questions(question_ids)
+            cache_session(session)
+            first_question = Question.objects.only('id', 'question_text').get(id=question_ids[0])
             
             print(f"Session created: {session.id}")  # Логирование
             return Response({
                 "real_pack_id" : pack_id, 
                 "first_question": {
-                    "id": questions.first().id,
-                    "question_text": questions.first().question_text
+                    "id": first_question.id,
+                    "question_text": first_question.question_text
                 },
                 "session": {
                     "id": session.id,
                     "current_question_index": 0,
-                    "questions_count": questions.count()
+                    "questions_count": len(question_ids)
                 }
             })
             
@@ -725,52 +801,143 @@ class GameStartView(APIView):
             print(f"Unexpected error: {str(e)}")  # Логирование
             return Response({"error": str(e)}, status=500)
 
+    def _parse_difficulty(self, value):
+        try:
+            return float(value) if value not in (None, '') else None
+        except ValueError:
+            return None
+
+class GameGenerateView(APIView):
+    """
+    Игра из случайных непросмотренных вопросов под кривую сложности.
+    Параметры: count (по умолчанию 36), curve ('flat' | 'ramp' | список уровней), difficulty.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        curve = request.data.get('curve', 'flat')
+        try:
+            count = int(request.data.get('count', 36))
+            difficulty = int(request.data.get('difficulty', 3))
+            if isinstance(curve, list):
+                curve = [int(level) for level in curve]
+        except (TypeError, ValueError):
+            return Response({"error": "Invalid parameters"}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(curve, list) and curve not in pack_generator.CURVES:
+            return Response({"error": "Unknown curve"}, status=status.HTTP_400_BAD_REQUEST)
+        if difficulty not in pack_generator.LEVELS:
+            return Response(
+                {"error": f"difficulty must be between {pack_generator.LEVELS[0]} and {pack_generator.LEVELS[-1]}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if isinstance(curve, list):
+            count = len(curve)
+        if not 1 <= count <= pack_generator.MAX_QUESTIONS:
+            return Response(
+                {"error": f"count must be between 1 and {pack_generator.MAX_QUESTIONS}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        session = pack_generator.generate_game(request.user, count, curve, difficulty)
+        if session is None:
+            return Response({"error": "No unseen questions left"}, status=status.HTTP_404_NOT_FOUND)
+        cache_session(session)
+
+        question_ids = session.get_question_ids()
+        first_question = Question.objects.only('id', 'question_text').get(id=question_ids[0])
+        return Response({
+            "real_pack_id": session.pack_id,
+            "first_question": {
+                "id": first_question.id,
+                "question_text": first_question.question_text
+            },
+            "session": {
+                "id": session.id,
+                "current_question_index": 0,
+                "questions_count": len(question_ids)
+            }
+        }, status=status.HTTP_201_CREATED)
+
 class SubmitAnswerView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, pack_id, question_id):
         try:
-            pack = Pack.objects.get(id=pack_id)
-            question = Question.objects.get(id=question_id)
+            # сессия и рейтинг пользователя блокируются до конца транзакции,
+            # поэтому параллельные ответы одного игрока выполняются по очереди
+            with transaction.atomic():
+                session = GameSession.objects.select_for_update().filter(
+                    user=request.user,
+                    pack_id=pack_id,
+                    is_completed=False
+                ).latest('created_at')
 
-            session = GameSession.objects.filter(
-                user=request.user,
-                pack=pack,
-                is_completed=False
-            ).latest('created_at')
+                if session.get_current_question_id() != question_id:
+                    return Response(
+                        {"error": "This is not the current question."},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                # на текущий вопрос уже ответили: повторный ответ не меняет счёт и рейтинг
+                if len(session.outcomes) > session.current_question_index:
+                    return Response(
+                        {"error": "This question has already been answered."},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
 
-            current_question = session.get_current_question()
-            if not current_question or current_question.id != question.id:
-                return Response(
-                    {"error": "This is not the current question."},
-                    status=status.HTTP_400_BAD_REQUEST
+                question = Question.objects.only(
+                    'id', 'question_text', 'answer_text', 'accepted_answers', 'answer_key',
+                    'difficulty', 'calibrated_difficulty'
+                ).get(id=question_id)
+                user = CustomUser.objects.select_for_update().only(
+                    'id', 'elo_rating'
+                ).get(pk=request.user.pk)
+
+                correct_answer = (question.answer_text or "").strip().lower()
+                is_correct = check_answer(question, request.data.get("answer"))
+
+                rating_change = elo.rating_change(user.elo_rating, question.get_effective_difficulty(), is_correct)
+
+                user.elo_rating += rating_change
+                user.save(update_fields=['elo_rating'])
+                request.user.elo_rating = user.elo_rating
+
+                session.record_outcome(question.pk, is_correct, rating_change, user.elo_rating)
+                if not is_correct:
+                    training.enqueue(user.pk, question.pk)
+
+                answered_at = timezone.now()
+                latency_ms = None
+                if session.question_shown_at:
+                    latency_ms = max(0, int((answered_at - session.question_shown_at).total_seconds() * 1000))
+
+                attempt_log.log_attempt(
+                    session_id=session.pk,
+                    user_id=user.pk,
+                    question_id=question.pk,
+                    submitted_answer=str(request.data.get("answer") or "")[:1000],
+                    is_correct=is_correct,
+                    rating_change=rating_change,
+                    latency_ms=latency_ms,
+                    created_at=answered_at,
                 )
 
-            user_answer = (request.data.get("answer") or "").strip().lower()
-            correct_answer = (question.answer_text or "").strip().lower()
-            is_correct = user_answer == correct_answer
-
-            rating_change = question.difficulty * 10
+            # ответ на последний вопрос: журнал сессии должен быть в базе
+            # раньше, чем её завершение увидят калибровка и результаты
+            if session.current_question_index + 1 >= session.get_questions_count():
+                attempt_log.flush()
 
-            if is_correct:
-                session.correct_answers += 1
-                request.user.elo_rating += rating_change
-            else:
-                request.user.elo_rating = max(500, request.user.elo_rating - rating_change) # минимум ело: 500
-            
-            request.user.save(update_fields=['elo_rating'])
-            session.save()
+            cache_session(session)
 
             return Response({
                 "is_correct": is_correct,
                 "correct_answer": correct_answer,
                 "current_score": session.correct_answers,
                 "rating_change": rating_change,
-                "new_rating": request.user.elo_rating,
-                "session": GameSessionSerializer(session).data
+                "new_rating": user.elo_rating,
+                "session": GameSessionSerializer(session, context={'current_question': question}).data
             })
 
-        except (Pack.DoesNotExist, Question.DoesNotExist):
+        except Question.DoesNotExist:
             return Response(
                 {"error": "Pack or question not found"},
                 status=status.HTTP_404_NOT_FOUND
@@ -782,16 +949,61 @@ class SubmitAnswerView(APIView):
             )
 
 
+class TrainingNextView(APIView):
+    """Следующий вопрос тренировки: ближайший по сроку повторения"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        item = training.next_item(request.user)
+        if item is None:
+            return Response({"question": None, "next_due_at": None})
+        if item.due_at > timezone.now():
+            return Response({"question": None, "next_due_at": item.due_at})
+        return Response({
+            "question": {
+                "id": item.question.id,
+                "question_text": item.question.question_text
+            },
+            "repetitions": item.repetitions,
+            "due_at": item.due_at
+        })
+
+
+class TrainingSubmitView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, question_id):
+        try:
+            # расписание обновляется в той же транзакции, что и проверка ответа
+            with transaction.atomic():
+                item = training.lock_item(request.user, question_id)
+                question = Question.objects.only(
+                    'id', 'answer_text', 'accepted_answers', 'answer_key'
+                ).get(id=question_id)
+                is_correct = check_answer(question, request.data.get("answer"))
+                training.review(item, is_correct)
+        except (ReviewItem.DoesNotExist, Question.DoesNotExist):
+            return Response(
+                {"error": "Question is not in your training queue"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        return Response({
+            "is_correct": is_correct,
+            "correct_answer": (question.answer_text or "").strip().lower(),
+            "repetitions": item.repetitions,
+            "interval_days": item.interval_days,
+            "due_at": item.due_at
+        })
+
+
 class NextQuestionView(APIView):
     def get(self, request, pack_id, question_id):
         try:
-            session = GameSession.objects.filter(
-                user=request.user,
-                pack_id=pack_id,
-                is_completed=False
-            ).latest('created_at')
+            session = get_active_session(request.user, pack_id, question_id)
             
             next_question = session.move_to_next_question()
+            cache_session(session)
             
             if next_question:
                 return Response({
@@ -802,14 +1014,14 @@ class NextQuestionView(APIView):
                     "session": {
                         "id": session.id,
                         "current_question_index": session.current_question_index,
-                        "questions_count": session.questions.count()
+                        "questions_count": session.get_questions_count()
                     }
                 })
             else:
                 return Response({
                     "message": "Game completed",
                     "final_score": session.correct_answers,
-                    "total_questions": session.questions.count()
+                    "total_questions": session.get_questions_count()
                 })
                 
         except GameSession.DoesNotExist:
@@ -823,31 +1035,25 @@ class PackQuestionView(APIView):
 
     def get(self, request, pack_id, question_id):
         try:
-            pack = Pack.objects.get(id=pack_id)
-            question = Question.objects.get(id=question_id)
+            session = get_active_session(request.user, pack_id, question_id)
 
-            session = GameSession.objects.filter(
-                user=request.user,
-                pack=pack,
-                is_completed=False
-            ).latest('created_at')
-
-            current_question = session.get_current_question()
-            if current_question.id != question.id:
+            if session.get_current_question_id() != question_id:
                 return Response(
                     {"error": "Это не текущий вопрос."},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
+            question = Question.objects.get(id=question_id)
+
             return Response({
                 "question": {
                     "id": question.id,
                     "question_text": question.question_text,
                     "image_attached": bool(question.image)
                 },
-                "session": GameSessionSerializer(session).data
+                "session": GameSessionSerializer(session, context={'current_question': question}).data
             })
-        except (Pack.DoesNotExist, Question.DoesNotExist):
+        except Question.DoesNotExist:
             return Response({"error": "Пак или вопрос не найдены"}, status=404)
         except GameSession.DoesNotExist:
             return Response({"error": "Нет активной игровой сессии"}, status=404)
@@ -876,67 +1082,63 @@ class GameResultsView(APIView):
     permission_classes = [permissions.IsAuthenticated]  
     
     def get(self, request, pack_id):
-        pack = get_object_or_404(Pack, id=pack_id)
-        
-        # Получаем последнюю завершенную сессию
+        # итог хранится в строке последней завершённой сессии
         session = GameSession.objects.filter(
             user=request.user,
-            pack=pack,
+            pack_id=pack_id,
             is_completed=True
-        ).order_by('-created_at').first()
+        ).select_related('pack').order_by('-created_at').first()
         
         if not session:
+            pack = get_object_or_404(Pack, id=pack_id)
             return Response({
                 "correct_answers": 0,
                 "total_questions": pack.questions.count(),
                 "previous_rating": request.user.elo_rating,
                 "current_rating": request.user.elo_rating,
                 "rating_change": 0,
+                "outcomes": [],
                 "pack": {
                     "id": pack.id,
                     "name": pack.name
                 }
             })
         
-        # Вычисляем изменение рейтинга
-        rating_change = 0
-        questions = session.questions.all().order_by('id')
-        
-        for i in range(session.current_question_index + 1):
-            question = questions[i]
-            is_correct = i < session.correct_answers
-            question_diff = question.difficulty * 10
-            rating_change += question_diff if is_correct else -question_diff
-        
-        previous_rating = request.user.elo_rating - rating_change
-        
-        return Response({
-            "correct_answers": session.correct_answers,
-            "total_questions": session.questions.count(),
-            "previous_rating": max(500, previous_rating),
-            "current_rating": request.user.elo_rating,
-            "rating_change": rating_change,
-            "pack": {
-                "id": pack.id,
-                "name": pack.name
-            }
-        })
+        return Response(GameResultSerializer(
+            session, context={'current_rating': request.user.elo_rating}
+        ).data)
+
+
+class GameHistoryView(generics.ListAPIView):
+    """Завершённые игры пользователя, новые первыми"""
+    serializer_class = GameResultSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = GameHistoryPagination
+
+    def get_queryset(self):
+        return GameSession.objects.filter(
+            user=self.request.user,
+            is_completed=True,
+            completed_at__isnull=False
+        ).select_related('pack')
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['current_rating'] = self.request.user.elo_rating
+        return context
     
 
 ###     FORUM INTERFACE      ###   
 
 
 class ThreadViewList(generics.ListCreateAPIView):
-    serializer_class = ForumThreadSerializer
+    """Список тем по последней активности (keyset-пагинация), без сообщений"""
+    serializer_class = ForumThreadSummarySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = ThreadPagination
     
     def get_queryset(self):
-        queryset = ForumThread.objects.annotate(
-            calculated_message_count=Count('messages'), 
-            last_activity=Max('messages__created_at')
-        ).select_related('created_by').prefetch_related('messages')
-        
-        queryset = queryset.order_by('-updated_at')
+        queryset = ForumThread.objects.select_related('created_by')
         
         is_closed = self.request.query_params.get('is_closed')
         if is_closed is not None:
@@ -953,19 +1155,17 @@ class ThreadViewList(generics.ListCreateAPIView):
  
 
 class ThreadMessagesViewList(generics.ListAPIView):
+    """Сообщения темы деревом: тема, все сообщения и голоса пользователя — три запроса при любом размере"""
     serializer_class = ForumMessageSerializer
-    
-    def get_queryset(self):
+
+    def list(self, request, *args, **kwargs):
         thread = get_object_or_404(ForumThread, pk=self.kwargs['pk'])
-        
-        return thread.messages.filter(
-            parent_message__isnull=True
-        ).select_related(
-            'author'
-        ).prefetch_related(
-            'replies',
-            'replies__author'
-        ).order_by('created_at')
+        roots, replies = thread.get_message_tree()
+
+        context = self.get_serializer_context()
+        context['replies'] = replies
+        context['user_votes'] = thread.get_user_votes(request.user)
+        return Response(ForumMessageSerializer(roots, many=True, context=context).data)
 
 
 class MessageCreateView(generics.CreateAPIView):
@@ -986,8 +1186,6 @@ class MessageCreateView(generics.CreateAPIView):
                 parent_message_id=request.data.get('parent_message')
             )
             
-            thread.save()
-            
             return Response(
                 ForumMessageSerializer(message, context=self.get_serializer_context()).data,
                 status=status.HTTP_201_CREATED
@@ -1013,16 +1211,14 @@ class MessageVoteView(generics.CreateAPIView):
         vote_value = serializer.validated_data['vote']
 
         with transaction.atomic():
-            vote, created = MessageVote.objects.update_or_create(
-                user=user,
-                message=message,
-                defaults={'vote': vote_value}
-            )
-            
-            message.rating = message.votes.aggregate(Sum('vote'))['vote__sum'] or 0
-            message.upvotes_count = message.votes.filter(vote=1).count()
-            message.downvotes_count = message.votes.filter(vote=-1).count()
-            message.save()
+            vote = MessageVote.objects.select_for_update().filter(user=user, message=message).first()
+            if vote is None:
+                vote = MessageVote(user=user, message=message)
+            vote.message = message
+            if vote.pk is None or vote.vote != vote_value:
+                # MessageVote.save сдвигает счётчики сообщения на разницу голосов
+                vote.vote = vote_value
+                vote.save()
 
         return Response({
             'id': vote.id,
@@ -1038,13 +1234,79 @@ class MessageVoteView(generics.CreateAPIView):
 
 
 class UserRatingHistoryView(APIView):
+    """
+    История рейтинга, сжатая в интервалы: ?resolution=hour|day|week,
+    ?from=/?to= (ISO-дата или дата-время, по умолчанию последние 30 дней).
+    """
     permission_classes = [permissions.IsAuthenticated]
 
-    def get(self, request):
-        three_days_ago = timezone.now() - timezone.timedelta(days=30)
-        history = UserRatingHistory.objects.filter(
-            user=request.user,
-            date__gte=three_days_ago
-        ).order_by('date')
-        serializer = UserRatingHistorySerializer(history, many=True)
+    def get(self, request, pk=None):
+        user = get_object_or_404(CustomUser, pk=pk) if pk is not None else request.user
+
+        resolution = request.query_params.get('resolution', 'day')
+        if resolution not in UserRatingHistory.RESOLUTIONS:
+            return Response(
+                {"error": f"resolution must be one of {', '.join(UserRatingHistory.RESOLUTIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            end = self._parse_bound(request.query_params.get('to')) or timezone.now()
+            start = self._parse_bound(request.query_params.get('from')) or end - timezone.timedelta(days=30)
+        except ValueError:
+            return Response({"error": "Invalid date range"}, status=status.HTTP_400_BAD_REQUEST)
+        if start > end:
+            return Response({"error": "Invalid date range"}, status=status.HTTP_400_BAD_REQUEST)
+
+        buckets = UserRatingHistory.objects.filter(
+            user=user,
+            date__gte=start,
+            date__lte=end
+        ).bucketed(resolution)
+        serializer = RatingHistoryBucketSerializer(buckets, many=True)
         return Response(serializer.data)
+
+    def _parse_bound(self, value):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(value)
+            parsed = datetime.datetime.combine(day, datetime.time.min)
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+
+class UserRatingHistoryDetailView(UserRatingHistoryView):
+    permission_classes = [permissions.AllowAny]
+
+
+class LeaderboardView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', 100))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, 1000))
+        return Response(leaderboard.top(limit))
+
+
+class LeaderboardAroundView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            radius = int(request.query_params.get('radius', 5))
+        except ValueError:
+            return Response({"error": "radius must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        radius = max(0, min(radius, 100))
+        rows, position = leaderboard.around(request.user, radius)
+        return Response({
+            "position": position,
+            "results": rows
+        })
@@ -128,6 +128,52 @@ DATABASES = {
     }
 } 
 
+# Cache
+# "game" хранит состояние активных игровых сессий (api/game_cache.py);
+# LocMemCache вытесняет давно не использованные записи при достижении MAX_ENTRIES.
+# В продакшене можно указать любой общий бэкенд (Redis, Memcached).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'game': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'game-sessions',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'CULL_FREQUENCY': 10,
+        },
+    },
+}
+
+GAME_SESSION_CACHE_TIMEOUT = 60 * 60
+PACK_POOL_CACHE_TIMEOUT = 10 * 60  # пул непустых паков для случайной игры (api/pack_pool.py)
+QUESTION_POOL_CACHE_TIMEOUT = 10 * 60  # пулы вопросов по сложности (api/pack_generator.py)
+
+# Похожесть (доля совпавших значений MinHash), с которой вопросы считаются дубликатами (api/duplicates.py)
+DUPLICATE_THRESHOLD = 0.8
+
+# История рейтинга (api/rating_history.py): 'answer' | 'session' | 'window'
+RATING_HISTORY_MODE = 'window'
+RATING_HISTORY_WINDOW = 5 * 60
+RATING_HISTORY_BATCH_SIZE = 500
+# как часто фоновый поток процесса пишет закончившиеся окна
+RATING_HISTORY_FLUSH_INTERVAL = 60
+# сколько закрытых окон буфер держит, пока база недоступна
+RATING_HISTORY_MAX_BUFFER = 10000
+
+# Журнал ответов (api/attempt_log.py): буфер пишется пачкой, когда набралось
+# ATTEMPT_LOG_BATCH_SIZE записей или прошло ATTEMPT_LOG_FLUSH_INTERVAL секунд
+ATTEMPT_LOG_BATCH_SIZE = 200
+ATTEMPT_LOG_FLUSH_INTERVAL = 5
+# Буфер у каждого процесса свой и пишется фоновым потоком раз в ATTEMPT_LOG_FLUSH_INTERVAL;
+# калибровка берёт сессии, завершённые раньше чем FLUSH_INTERVAL + SETTLE_MARGIN секунд назад
+ATTEMPT_LOG_SETTLE_MARGIN = 5
+# сколько строк буфер журнала держит, пока база недоступна (лишние, самые старые, отбрасываются)
+ATTEMPT_LOG_MAX_BUFFER = 10000
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
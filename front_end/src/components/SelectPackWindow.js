@@ -222,7 +222,7 @@ const SelectPackWindow = ({ open, onClose }) => {
                 >
                   <ListItemText
                     primary={pack.name}
-                    secondary={`Вопросов: ${pack.questions.length}`}
+                    secondary={`Вопросов: ${pack.questions_count}`}
                   />
                   <Button
                     variant="contained"
@@ -25,6 +25,7 @@ import { useTheme } from "@mui/material/styles";
 import axios from "axios";
 import { checkAuth, getAccessToken, clearAuthTokens } from "../utils/AuthUtils";
 import AddPackSuccess from "../components/AddPackSuccess";
+import { fetchAllPages } from "../utils/PaginationUtils";
 
 const AddPack = () => {
   const theme = useTheme();
@@ -65,22 +66,18 @@ const AddPack = () => {
         const token = getAccessToken();
         if (!token) throw new Error("Токен доступа не найден");
 
-        const questionsResponse = await axios.get(
-          `${API_BASE_URL}/api/question/list/`,
+        const authorQuestions = await fetchAllPages(
+          `${API_BASE_URL}/api/question/list/${user.id}/`,
           { headers: { "Authorization": `Bearer ${token}` } }
         );
 
-        const filteredQuestions = questionsResponse.data.filter(
-          q => q.author_q?.id === user.id
-        );
-
         setAuthState({
           isAuthenticated: true,
           user,
           isLoading: false,
           error: null
         });
-        setUserQuestions(filteredQuestions);
+        setUserQuestions(authorQuestions);
       } catch (error) {
         console.error("Ошибка при загрузке данных:", error);
         clearAuthTokens(); 
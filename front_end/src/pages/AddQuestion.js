@@ -27,6 +27,7 @@ const AddQuestion = () => {
   const [questionData, setQuestionData] = useState({
     text: "",
     answer: "",
+    accepted: "",
     comment: "",
     difficulty: 1
   });
@@ -120,6 +121,7 @@ const AddQuestion = () => {
         {
           question_text: questionData.text.trim(),
           answer_text: questionData.answer.trim(),
+          accepted_answers: questionData.accepted.trim(),
           question_note: questionData.comment.trim(),
           difficulty: questionData.difficulty,
           author_q: user.id,
@@ -174,7 +176,7 @@ const AddQuestion = () => {
       }
     } finally {
       setSuccessModalOpen(true);
-      setQuestionData({ text: "", answer: "", comment: "", difficulty: 1});
+      setQuestionData({ text: "", answer: "", accepted: "", comment: "", difficulty: 1});
       setSubmitting(false);
     }
   };
@@ -312,6 +314,20 @@ const AddQuestion = () => {
           }}
         />
 
+        <TextField
+          label="Зачёт (варианты через точку с запятой, необязательно)"
+          fullWidth
+          value={questionData.accepted}
+          onChange={handleInputChange("accepted")}
+          sx={{ 
+            borderRadius: 1,
+            backgroundColor: theme.palette.background.white,
+            '& .MuiInputBase-input': {
+              color: theme.palette.text.dark
+            }
+          }}
+        />
+
         <FormControl 
           fullWidth
           sx={{ 
@@ -31,6 +31,7 @@ import { useTheme } from "@mui/material/styles";
 import axios from "axios";
 import { useNavigate } from "react-router-dom";
 import { LineChart } from '@mui/x-charts/LineChart';
+import { fetchAllPages } from "../utils/PaginationUtils";
 
 const MyProfile = () => {
   const theme = useTheme();
@@ -80,7 +81,7 @@ const MyProfile = () => {
 
         setResourcesLoading(true);
         const [questionsRes, packsRes, teamsRes] = await Promise.all([
-          axios.get(`${API_BASE_URL}/api/question/list/${userData.id}`, { 
+          fetchAllPages(`${API_BASE_URL}/api/question/list/${userData.id}/`, { 
             headers: { "Authorization": `Bearer ${token}` },
           }),
           axios.get(`${API_BASE_URL}/api/pack/list/${userData.id}`, { 
@@ -96,7 +97,7 @@ const MyProfile = () => {
         );
 
         setUserResources({
-          questions: questionsRes.data,
+          questions: questionsRes,
           packs: packsRes.data,
           teams: userTeams
         });
@@ -492,7 +493,7 @@ const MyProfile = () => {
                     <ListItemText
                       primary={pack.name}
                       primaryTypographyProps={{ fontWeight: 'medium' }}
-                      secondary={`${pack.questions?.length || 0} вопросов`}
+                      secondary={`${pack.questions_count || 0} вопросов`}
                     />
                   </ListItemButton>
                 </ListItem>
@@ -52,6 +52,8 @@ const NewsPage = () => {
   const [authAlert, setAuthAlert] = useState(false);
   const [expanded, setExpanded] = useState(false);
   const [threads, setThreads] = useState([]);
+  const [nextThreadsUrl, setNextThreadsUrl] = useState(null);
+  const [threadsLoadingMore, setThreadsLoadingMore] = useState(false);
   const [activeThread, setActiveThread] = useState(null);
   const [messages, setMessages] = useState({});
   const [newMessage, setNewMessage] = useState("");
@@ -120,7 +122,8 @@ const NewsPage = () => {
         const response = await axios.get(`${API_BASE_URL}/api/threads/`, {
           timeout: 5000
         });
-        setThreads(response.data || []);
+        setThreads(response.data.results || []);
+        setNextThreadsUrl(response.data.next);
       } catch (err) {
         console.error("Threads load error:", err);
         setError(err.message || "Ошибка загрузки тем");
@@ -132,6 +135,25 @@ const NewsPage = () => {
     fetchThreads();
   }, []);
 
+  const loadMoreThreads = async () => {
+    if (!nextThreadsUrl) return;
+    try {
+      setThreadsLoadingMore(true);
+      const response = await axios.get(nextThreadsUrl, { timeout: 5000 });
+      // тема, в которой появилось сообщение, могла уже подняться на первую страницу
+      setThreads(prev => {
+        const known = new Set(prev.map(thread => thread.id));
+        return [...prev, ...(response.data.results || []).filter(thread => !known.has(thread.id))];
+      });
+      setNextThreadsUrl(response.data.next);
+    } catch (err) {
+      console.error("Threads load error:", err);
+      setError(err.message || "Ошибка загрузки тем");
+    } finally {
+      setThreadsLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     if (!activeThread) return;
 
@@ -191,7 +213,7 @@ const NewsPage = () => {
         }
       );
 
-      setThreads([...threads, response.data]);
+      setThreads([response.data, ...threads]);
       setNewThreadTitle("");
       setShowThreadForm(false);
       setActiveThread(response.data);
@@ -634,6 +656,17 @@ const NewsPage = () => {
                             <Divider />
                           </React.Fragment>
                         ))}
+                        {nextThreadsUrl && (
+                          <Box sx={{ display: 'flex', justifyContent: 'center', p: 2 }}>
+                            <Button
+                              variant="outlined"
+                              onClick={loadMoreThreads}
+                              disabled={threadsLoadingMore}
+                            >
+                              {threadsLoadingMore ? <CircularProgress size={24} /> : 'Загрузить ещё'}
+                            </Button>
+                          </Box>
+                        )}
                       </List>
                     )}
                   </>
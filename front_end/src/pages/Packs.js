@@ -18,7 +18,7 @@ const Packs = () => {
         const data = response.data.map((item) => ({
           id: item.id,
           name: item.name,
-          questions: item.questions,
+          questions_count: item.questions_count,
           author_p: item.author_p?.username || "Неизвестно",
           description: item.description || "",
           pub_date_p: (item.pub_date_p ? new Date(item.pub_date_p).toLocaleDateString("ru-RU") : "Неизвестно")
@@ -17,6 +17,7 @@ const QuestionDetail = () => {
     image_attached: "",
     question_text: "",
     answer_text: "",
+    accepted_answers: [],
     question_note: ""
   });
   const [answer, setAnswer] = useState("");
@@ -52,6 +53,7 @@ const QuestionDetail = () => {
           id: data.id,
           question_text: data.question_text || "Неизвестно",
           answer_text: data.answer_text || "",
+          accepted_answers: data.accepted_answers || [],
           author_q: authorName, 
           image_attached: data.image_attached || false,
           question_note: data.question_note,
@@ -72,6 +74,7 @@ const QuestionDetail = () => {
 
   const [questionTextEdit, setQuestionTextEdit] = useState("");
   const [questionAnsEdit, setQuestionAnsEdit] = useState("");
+  const [questionAcceptedEdit, setQuestionAcceptedEdit] = useState("");
 
   const [buttonsPending, setButtonsPending] = useState(false);
   const [buttonsEdit, setButtonsEdit] = useState(false);
@@ -92,6 +95,7 @@ const QuestionDetail = () => {
   const handleEditButton = () => {
     setQuestionTextEdit(question.question_text);
     setQuestionAnsEdit(question.answer_text);
+    setQuestionAcceptedEdit(question.accepted_answers.join("; "));
     setButtonsEdit(true);
     
     setGoodState("");
@@ -153,7 +157,8 @@ const QuestionDetail = () => {
         `${API_BASE_URL}/api/question/update/${question.id}/`,
         {
           question_text: questionTextEdit.trim(),
-          answer_text: questionAnsEdit.trim()
+          answer_text: questionAnsEdit.trim(),
+          accepted_answers: questionAcceptedEdit.trim()
         },
         {
           headers: {
@@ -207,6 +212,11 @@ const QuestionDetail = () => {
 
       question.question_text = questionTextEdit.trim();
       question.answer_text = questionAnsEdit.trim();
+      const acceptedEdit = questionAcceptedEdit.trim().replace(/\.$/, "");
+      question.accepted_answers = acceptedEdit
+        .split(acceptedEdit.includes(";") ? ";" : ",")
+        .map((variant) => variant.trim())
+        .filter(Boolean);
       setGoodState("Информация обновлена!");
     }
     catch (error) {
@@ -269,12 +279,17 @@ const QuestionDetail = () => {
     setAnswer(event.target.value);
   };
 
-  const handleSubmit = () => {
+  const handleSubmit = async () => {
     if (user.username) {
-      if (answer.trim().toLowerCase() === question.answer_text.toLowerCase()) {
-        setFeedback("correct");
-      } else {
-        setFeedback("incorrect");
+      try {
+        const response = await axios.post(
+          `${API_BASE_URL}/api/question/${question.id}/check/`,
+          { answer: answer.trim() }
+        );
+        setFeedback(response.data.is_correct ? "correct" : "incorrect");
+      } catch (error) {
+        console.error("Ошибка при проверке ответа:", error);
+        setErrState("Не удалось проверить ответ");
       }
     } else {
       navigate("/login");
@@ -457,6 +472,15 @@ const QuestionDetail = () => {
                 onChange={(e) => setQuestionAnsEdit(e.target.value)}
                 sx={{ mb: 2 }}
               />
+              <TextField
+                label="Зачёт (варианты через точку с запятой, необязательно)"
+                variant_tf="dark"
+                fullWidth
+                disabled={buttonsPending}
+                defaultValue={question.accepted_answers.join("; ")}
+                onChange={(e) => setQuestionAcceptedEdit(e.target.value)}
+                sx={{ mb: 2 }}
+              />
             </Box>
           )}
         </Stack>
@@ -524,6 +548,11 @@ const QuestionDetail = () => {
                               }}>
                     {question.answer_text}
                   </Typography>
+                  {question.accepted_answers.length > 0 && (
+                    <Typography variant="body2" sx={{ color: 'inherit', mt: 1 }}>
+                      Зачёт: {question.accepted_answers.join("; ")}
+                    </Typography>
+                  )}
                 </Box>
 
                 <Box>
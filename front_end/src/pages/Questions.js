@@ -1,5 +1,5 @@
 import API_BASE_URL from '../config';
-import axios from "axios";
+import { fetchPage } from "../utils/PaginationUtils";
 
 import React, { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
@@ -12,25 +12,37 @@ const Questions = () => {
   const [originalRows, setOriginalRows] = useState([]);
   const [searchText, setSearchText] = useState("");
   const [visited, setVisited] = useState({});
+  const [nextUrl, setNextUrl] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const navigate = useNavigate();
 
-  useEffect(() => {
-    axios.get(`${API_BASE_URL}/api/question/list/`)
-      .then(response => {
-        const data = response.data.map((item) => ({
-          id: item.id,
-          question_text: item.question_text,
-          answer_text: item.answer_text,
-          author_q: item.author_q?.username || "Неизвестно",
-          pub_date_q: (item.pub_date_q ? new Date(item.pub_date_q).toLocaleDateString("ru-RU") : "Неизвестно"),
-          difficulty: item.difficulty || 1
-        }));
-        setRows(data);
-        setOriginalRows(data);
+  const toRow = (item) => ({
+    id: item.id,
+    question_text: item.question_text,
+    answer_text: item.answer_text,
+    author_q: item.author_q?.username || "Неизвестно",
+    pub_date_q: (item.pub_date_q ? new Date(item.pub_date_q).toLocaleDateString("ru-RU") : "Неизвестно"),
+    difficulty: item.difficulty || 1
+  });
+
+  const loadPage = (url) => {
+    setLoadingMore(true);
+    fetchPage(url)
+      .then(({ results, next }) => {
+        const data = results.map(toRow);
+        const loaded = [...originalRows, ...data];
+        setOriginalRows(loaded);
+        setRows(loaded.filter((row) => row.question_text.toLowerCase().includes(searchText.toLowerCase())));
+        setNextUrl(next);
       })
       .catch(error => {
         console.error("Ошибка при загрузке данных:", error);
-      });
+      })
+      .finally(() => setLoadingMore(false));
+  };
+
+  useEffect(() => {
+    loadPage(`${API_BASE_URL}/api/question/list/`);
   }, []);
 
   const handleRowClick = (params) => {
@@ -114,6 +126,14 @@ const Questions = () => {
         onRowClick={handleRowClick}
       />
 
+      {nextUrl && (
+        <Box sx={{ display: "flex", justifyContent: "center", mt: 2 }}>
+          <Button variant="red" onClick={() => loadPage(nextUrl)} disabled={loadingMore}>
+            Загрузить ещё
+          </Button>
+        </Box>
+      )}
+
     </Box>
   );
 };
@@ -57,21 +57,27 @@ const Rating = () => {
           throw new Error("Требуется авторизация");
         }
 
-        const response = await axios.get(`${API_BASE_URL}/api/user/list/`, {
-          headers: {
-            "Authorization": `Bearer ${token}`,
-            "Content-Type": "application/json",
-          },
+        const headers = {
+          "Authorization": `Bearer ${token}`,
+          "Content-Type": "application/json",
+        };
+        const [topResponse, aroundResponse] = await Promise.all([
+          axios.get(`${API_BASE_URL}/api/rating/leaderboard/?limit=500`, { headers }),
+          axios.get(`${API_BASE_URL}/api/rating/leaderboard/me/`, { headers })
+        ]);
+
+        const byId = new Map();
+        [...topResponse.data, ...aroundResponse.data.results].forEach((user) => {
+          byId.set(user.id, user);
         });
 
-        const formattedData = response.data
-          .sort((a, b) => (b.elo_rating || 1000) - (a.elo_rating || 1000))
-          .map((user, index) => ({
+        const formattedData = [...byId.values()]
+          .sort((a, b) => (b.elo_rating - a.elo_rating) || (a.id - b.id))
+          .map((user) => ({
             id: user.id,
-            position: index + 1,
+            position: user.position,
             username: user.username || "Неизвестно",
-            email: user.email || "Не указан",
-            elo_rating: user.elo_rating || 1000
+            elo_rating: user.elo_rating
           }));
 
         setRows(formattedData);
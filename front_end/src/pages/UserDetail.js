@@ -33,6 +33,7 @@ import { getAccessToken } from "../utils/AuthUtils";
 import { useTheme } from "@mui/material/styles";
 import axios from "axios";
 import { LineChart } from '@mui/x-charts/LineChart';
+import { fetchAllPages } from "../utils/PaginationUtils";
 
 const StyledProfileBox = styled(Paper)(({ theme }) => ({
   padding: theme.spacing(3),
@@ -80,14 +81,14 @@ const UserDetail = () => {
         const headers = token ? { Authorization: `Bearer ${token}` } : {};
         
         const [questionsRes, packsRes, teamsRes, ratingRes] = await Promise.all([
-          axios.get(`${API_BASE_URL}/api/question/list/${userId}`, { 
+          fetchAllPages(`${API_BASE_URL}/api/question/list/${userId}/`, { 
             headers,
           }),
           axios.get(`${API_BASE_URL}/api/pack/list/${userId}`, { 
             headers,
           }),
           axios.get(`${API_BASE_URL}/api/team/list/`, { headers }),
-          axios.get(`${API_BASE_URL}/api/user/rating-history/`, { headers })
+          axios.get(`${API_BASE_URL}/api/user/${userId}/rating-history/`, { headers })
         ]);
 
         const userTeams = teamsRes.data.filter(team => 
@@ -112,7 +113,7 @@ const UserDetail = () => {
         }
 
         setUserResources({
-          questions: questionsRes.data,
+          questions: questionsRes,
           packs: packsRes.data,
           teams: userTeams
         });
@@ -493,7 +494,7 @@ const UserDetail = () => {
                   </ListItemAvatar>
                   <ListItemText
                     primary={pack.name}
-                    secondary={`${pack.questions?.length || 0} вопросов • Рейтинг: ${pack.rating || 0}`}
+                    secondary={`${pack.questions_count || 0} вопросов • Рейтинг: ${pack.rating || 0}`}
                   />
                 </ListItem>
               ))}
@@ -0,0 +1,23 @@
+import axios from "axios";
+
+/**
+ * Загружает одну страницу курсорного списка: { results, next }
+ */
+export const fetchPage = async (url, config = {}) => {
+  const response = await axios.get(url, config);
+  return { results: response.data.results, next: response.data.next };
+};
+
+/**
+ * Проходит по ссылкам next до конца списка и возвращает все строки
+ */
+export const fetchAllPages = async (url, config = {}) => {
+  const rows = [];
+  let nextUrl = url;
+  while (nextUrl) {
+    const { results, next } = await fetchPage(nextUrl, config);
+    rows.push(...results);
+    nextUrl = next;
+  }
+  return rows;
+};
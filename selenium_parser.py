@@ -9,6 +9,8 @@ import json
 import re
 import random
 
+from api.matching import split_accepted_answers
+
 driver = webdriver.Chrome()
 questions_list = []
 
@@ -56,12 +58,19 @@ try:
                 comment = re.sub(r'^Комментарий:\s*', '', comment).strip()
             except:
                 comment = ""
+
+            try:
+                accepted = answer_div.find_element(By.XPATH, './/p[contains(., "Зачёт:") or contains(., "Зачет:")]').text
+                accepted_answers = split_accepted_answers(accepted)
+            except:
+                accepted_answers = []
             
             question_data = {
                 "model": "api.question",
                 "fields": {
                     "question_text": question_text,
                     "answer_text": answer_text,
+                    "accepted_answers": accepted_answers,
                     "question_note": comment,
                     "difficulty": random.randint(1, 5),
                     "author_q": 1,